@@ -0,0 +1,99 @@
+"""
+Продовый запуск: gunicorn -c gunicorn.conf.py
+
+По умолчанию WSGI на gthread-воркерах. GUNICORN_ASGI=True — uvicorn-воркеры
+с async-вьюхами публичного API (survey_app.asgi).
+"""
+import os
+import sys
+import tempfile
+
+ASGI = os.getenv("GUNICORN_ASGI", "False") == "True"
+
+
+def _cpu_count():
+    # Учитывает ограничение CPU контейнера через affinity, в отличие от cpu_count()
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+CPUS = _cpu_count()
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Общий каталог метрик воркеров (prometheus_client multiprocess); должен быть
+# задан до загрузки приложения, чтобы /metrics суммировал все воркеры
+METRICS_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "survey_metrics")
+)
+
+if ASGI:
+    # Один event loop на ядро: конкурентность дают корутины, а не потоки
+    wsgi_app = "survey_app.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+    workers = int(os.getenv("GUNICORN_WORKERS", CPUS))
+else:
+    # Запросы в основном ждут БД: немного процессов, несколько потоков в каждом
+    wsgi_app = "survey_app.wsgi:application"
+    worker_class = "gthread"
+    workers = int(os.getenv("GUNICORN_WORKERS", CPUS + 1))
+    threads = int(os.getenv("GUNICORN_THREADS", 4))
+
+# Приложение грузится в мастере один раз, воркеры делят память через fork
+preload_app = True
+
+# Перезапуск воркеров против утечек; jitter — чтобы не рестартовали разом
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+
+
+def on_starting(server):
+    """
+    Не стартуем с непроизводственными настройками (DEBUG, ключ, БД, кэш).
+    """
+    import django
+    from django.core.management import call_command
+    from django.core.management.base import SystemCheckError
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "survey_app.settings")
+    django.setup()
+
+    try:
+        call_command("check", deploy=True, fail_level="ERROR")
+    except SystemCheckError as exc:
+        server.log.error("Refusing to start, configuration check failed:\n%s", exc)
+        sys.exit(1)
+
+    from survey.metrics import reset_multiprocess_dir
+
+    reset_multiprocess_dir(METRICS_DIR)
+
+
+def when_ready(server):
+    # Приложение уже загружено (preload_app), воркеры еще не запущены
+    from survey.db import close_pools
+
+    close_pools()
+
+
+def post_fork(server, worker):
+    # Соединения, открытые в мастере при preload, не должны делиться между воркерами
+    from django.db import connections
+
+    connections.close_all()
+
+
+def child_exit(server, worker):
+    # Значения завершившегося воркера переходят в архив: счетчики не сбрасываются
+    from survey.metrics import archive_process
+
+    archive_process(worker.pid, METRICS_DIR)
@@ -1,9 +1,9 @@
 from django.contrib import admin
 from django.urls import path, reverse
 from django.template.response import TemplateResponse
-from django.db.models import Avg, Count
 from django.shortcuts import get_object_or_404
 from django.http import HttpResponseForbidden
+from django.utils import timezone
 from django.utils.html import format_html
 
 from unfold.admin import ModelAdmin
@@ -11,7 +11,11 @@ from unfold.admin import ModelAdmin
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin
 
-from .models import Survey, Question, Answer, Point, OwnerProfile
+from .analytics import get_question_stats
+from .models import Survey, Question, Answer, Point, OwnerProfile, OutboxEvent
+from .ownership import is_owner, owner_point_ids
+from .routers import read_from_replica
+from .stats import get_daily_stats, point_daily_stats, summarize_daily_stats
 
 
 # =========================
@@ -81,19 +85,20 @@ class SurveyAdmin(ModelAdmin):
         "view_link",
     )
 
+    list_select_related = ("point",)
     ordering = ("-created_at",)
     inlines = [AnswerInline]
 
     # ===== ДОСТУП =====
 
     def has_module_permission(self, request):
-        return request.user.is_superuser or hasattr(request.user, "ownerprofile")
+        return request.user.is_superuser or is_owner(request.user)
 
     def has_view_permission(self, request, obj=None):
-        return request.user.is_superuser or hasattr(request.user, "ownerprofile")
+        return request.user.is_superuser or is_owner(request.user)
 
     def has_change_permission(self, request, obj=None):
-        return request.user.is_superuser or hasattr(request.user, "ownerprofile")
+        return request.user.is_superuser or is_owner(request.user)
 
     def has_add_permission(self, request):
         return request.user.is_superuser
@@ -104,16 +109,23 @@ class SurveyAdmin(ModelAdmin):
     # ===== ФИЛЬТР ПВЗ =====
 
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
+        qs = super().get_queryset(request).with_average_rating()
 
         if request.user.is_superuser:
             return qs
 
-        if hasattr(request.user, "ownerprofile"):
-            return qs.filter(point__in=request.user.ownerprofile.points.all())
+        point_ids = owner_point_ids(request.user)
+        if point_ids is not None:
+            return qs.filter(point_id__in=point_ids)
 
         return qs.none()
 
+    # ===== СРЕДНИЙ РЕЙТИНГ =====
+
+    @admin.display(description="Средний рейтинг", ordering="avg_rating")
+    def average_rating(self, obj):
+        return obj.average_rating
+
     # ===== КНОПКА ОТКРЫТЬ =====
 
     def view_link(self, obj):
@@ -134,12 +146,12 @@ class SurveyAdmin(ModelAdmin):
         custom_urls = [
             path(
                 "rating-dashboard/",
-                self.admin_site.admin_view(self.rating_dashboard_view),
+                self.admin_site.admin_view(read_from_replica(self.rating_dashboard_view)),
                 name="survey-rating-dashboard",
             ),
             path(
                 "<int:survey_id>/view/",
-                self.admin_site.admin_view(self.view_clean_page),
+                self.admin_site.admin_view(read_from_replica(self.view_clean_page)),
                 name="survey-view-clean",
             ),
         ]
@@ -150,51 +162,28 @@ class SurveyAdmin(ModelAdmin):
         date_from = request.GET.get("date_from")
         date_to = request.GET.get("date_to")
 
-        surveys = Survey.objects.all()
+        point_ids = None
 
         # 🔒 Ограничение владельца
         if not request.user.is_superuser:
-            if hasattr(request.user, "ownerprofile"):
-                surveys = surveys.filter(
-                    point__in=request.user.ownerprofile.points.all()
-                )
-            else:
-                surveys = surveys.none()
-
-        # 📅 Фильтр по дате
-        if date_from:
-            surveys = surveys.filter(created_at__date__gte=date_from)
-
-        if date_to:
-            surveys = surveys.filter(created_at__date__lte=date_to)
-
-        answers = Answer.objects.filter(
-            survey__in=surveys,
-            answer_rating__isnull=False
-        )
+            point_ids = owner_point_ids(request.user) or ()
 
-        stats = (
-            answers.values(
-                "survey__point__city",
-                "survey__point__name",
-            )
-            .annotate(
-                avg_rating=Avg("answer_rating"),
-                total_reviews=Count("id"),
-            )
-            .order_by("-avg_rating")
-        )
+        # 📅 Фильтр по дате — по суточной сводке
+        daily_stats = get_daily_stats(point_ids, date_from, date_to)
+
+        stats = point_daily_stats(daily_stats)
+        totals = summarize_daily_stats(daily_stats)
 
-        total_orders = surveys.count()
-        total_feedback_orders = surveys.filter(completed=True).count()
-        total_reviews = answers.count()
+        # Тот же кэш, что и у дашборда владельца
+        question_stats = get_question_stats(point_ids, date_from, date_to)
 
         context = dict(
             self.admin_site.each_context(request),
             stats=stats,
-            total_orders=total_orders,
-            total_feedback_orders=total_feedback_orders,
-            total_reviews=total_reviews,
+            question_stats=question_stats,
+            total_orders=totals["issued_count"],
+            total_feedback_orders=totals["completed_count"],
+            total_reviews=totals["rating_count"],
             title="Дашборд рейтингов ПВЗ",
             date_from=date_from,
             date_to=date_to,
@@ -216,10 +205,8 @@ class SurveyAdmin(ModelAdmin):
 
         # 🔒 Ограничение владельца
         if not request.user.is_superuser:
-            if not hasattr(request.user, "ownerprofile"):
-                return HttpResponseForbidden()
-
-            if survey.point not in request.user.ownerprofile.points.all():
+            point_ids = owner_point_ids(request.user)
+            if point_ids is None or survey.point_id not in point_ids:
                 return HttpResponseForbidden()
 
         answers = survey.answer_set.select_related("question").all()
@@ -234,6 +221,32 @@ class SurveyAdmin(ModelAdmin):
         )
 
 
+# =========================
+# OUTBOX
+# =========================
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(ModelAdmin):
+    list_display = ("id", "kind", "status", "attempts", "created_at", "available_at", "processed_at")
+    list_filter = ("status", "kind")
+    readonly_fields = [field.name for field in OutboxEvent._meta.fields]
+    actions = ["retry_events"]
+
+    def has_module_permission(self, request):
+        return request.user.is_superuser
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Повторить")
+    def retry_events(self, request, queryset):
+        queryset.exclude(status=OutboxEvent.Status.DONE).update(
+            status=OutboxEvent.Status.PENDING,
+            attempts=0,
+            available_at=timezone.now(),
+        )
+
+
 # =========================
 # USER ADMIN
 # =========================
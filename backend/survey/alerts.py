@@ -0,0 +1,229 @@
+import json
+import logging
+import urllib.request
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .metrics import registry
+from .models import LowRatingAlert
+from .ownership import point_owner_ids
+
+logger = logging.getLogger("survey.alerts")
+
+
+# =====================================================
+# ПОСТАНОВКА В ОЧЕРЕДЬ
+# =====================================================
+
+def record_low_ratings(survey, ratings):
+    """
+    Уведомления владельцам ПВЗ об опросе с оценкой не выше порога.
+
+    Вызывается воркером outbox, не запросом клиента.
+    """
+    if not ratings or min(ratings) > settings.ALERT_RATING_THRESHOLD:
+        return 0
+
+    alerts = [
+        LowRatingAlert(owner_id=owner_id, survey_id=survey.pk, point_id=survey.point_id, rating=min(ratings))
+        for owner_id in point_owner_ids(survey.point_id)
+    ]
+    LowRatingAlert.objects.bulk_create(alerts, ignore_conflicts=True)
+    return len(alerts)
+
+
+# =====================================================
+# ДОСТАВКА
+# =====================================================
+
+class BaseAlertBackend:
+    """
+    Канал доставки дайджеста. send() бросает исключение, если доставить не удалось.
+    """
+
+    def send(self, owner, alerts):
+        raise NotImplementedError
+
+
+def _format_alert(alert):
+    created_at = timezone.localtime(alert.created_at).strftime("%d.%m.%Y %H:%M")
+    return (
+        f"{alert.point.city} — {alert.point.name}: заказ {alert.survey.order_number}, "
+        f"оценка {alert.rating}, {created_at}"
+    )
+
+
+class EmailAlertBackend(BaseAlertBackend):
+
+    def send(self, owner, alerts):
+        if not owner.email:
+            return
+
+        shown = alerts[: settings.ALERT_DIGEST_MAX_ITEMS]
+        lines = [_format_alert(alert) for alert in shown]
+        if len(alerts) > len(shown):
+            lines.append(f"… и еще {len(alerts) - len(shown)}")
+
+        send_mail(
+            subject=f"Низкие оценки в ПВЗ: {len(alerts)}",
+            message="\n".join(lines),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[owner.email],
+        )
+
+
+class WebhookAlertBackend(BaseAlertBackend):
+
+    def send(self, owner, alerts):
+        if not settings.ALERT_WEBHOOK_URL:
+            return
+
+        payload = {
+            "owner": owner.username,
+            "alerts": [
+                {
+                    "point_id": alert.point_id,
+                    "point": f"{alert.point.city} — {alert.point.name}",
+                    "order_number": alert.survey.order_number,
+                    "rating": alert.rating,
+                    "created_at": alert.created_at.isoformat(),
+                }
+                for alert in alerts
+            ],
+        }
+        request = urllib.request.Request(
+            settings.ALERT_WEBHOOK_URL,
+            data=json.dumps(payload, ensure_ascii=False).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        # Ответ не 2xx — HTTPError, дайджест останется неотправленным
+        with urllib.request.urlopen(request, timeout=settings.ALERT_WEBHOOK_TIMEOUT):
+            pass
+
+
+@lru_cache
+def get_backends():
+    """
+    {путь из ALERT_BACKENDS: канал}; путь отмечается в sent_backends.
+    """
+    return {path: import_string(path)() for path in settings.ALERT_BACKENDS}
+
+
+def _retry_delay(attempts):
+    return timedelta(
+        seconds=min(settings.ALERT_RETRY_BASE_DELAY * 2 ** (attempts - 1), settings.ALERT_RETRY_MAX_DELAY)
+    )
+
+
+def _due_alerts(now):
+    # Неотправленные, не исчерпавшие попытки и дождавшиеся повтора
+    return LowRatingAlert.objects.filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now),
+        sent_at__isnull=True,
+        attempts__lt=settings.ALERT_MAX_ATTEMPTS,
+    )
+
+
+def send_due_digests():
+    """
+    Отправляет дайджесты владельцам, у которых окно набралось:
+    самое старое неотправленное уведомление старше ALERT_DIGEST_WINDOW
+    или их уже ALERT_DIGEST_MAX_ITEMS. Возвращает число дайджестов.
+
+    Плохой день на загруженном ПВЗ дает одно письмо за окно, а не сотни.
+    Каждый канал получает только еще не доставленные им уведомления:
+    сбой вебхука не повторяет уже отправленное письмо. Неудача откладывает
+    повтор с экспоненциальной задержкой, после ALERT_MAX_ATTEMPTS попыток
+    уведомление больше не отправляется.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.ALERT_DIGEST_WINDOW)
+
+    owner_ids = list(
+        _due_alerts(now)
+        .values("owner")
+        .annotate(first_at=Min("created_at"), pending=Count("id"))
+        .filter(Q(first_at__lte=cutoff) | Q(pending__gte=settings.ALERT_DIGEST_MAX_ITEMS))
+        .values_list("owner", flat=True)
+    )
+
+    sent = 0
+    for owner_id in owner_ids:
+        with transaction.atomic():
+            alerts = list(
+                _due_alerts(now)
+                .select_for_update(skip_locked=True, of=("self",))
+                .filter(owner_id=owner_id)
+                .select_related("owner", "point", "survey")
+                .order_by("created_at")
+            )
+            if not alerts:
+                # Дайджест забрал параллельный воркер
+                continue
+
+            if _deliver(alerts[0].owner, alerts):
+                sent += 1
+
+            LowRatingAlert.objects.bulk_update(
+                alerts,
+                ["sent_at", "sent_backends", "attempts", "next_attempt_at", "last_error"],
+            )
+
+    return sent
+
+
+def _deliver(owner, alerts):
+    """
+    Шлет дайджест каждым каналом и отмечает результат на уведомлениях
+    (без сохранения). True, если доставлен всеми каналами.
+    """
+    errors = []
+    for path, backend in get_backends().items():
+        pending = [alert for alert in alerts if path not in alert.sent_backends]
+        if not pending:
+            continue
+
+        try:
+            backend.send(owner, pending)
+        except Exception as exc:
+            errors.append(f"{path}: {exc!r}")
+            registry.inc("survey_alert_digests_total", (("backend", path), ("status", "failed")))
+            continue
+
+        for alert in pending:
+            alert.sent_backends = [*alert.sent_backends, path]
+        registry.inc("survey_alert_digests_total", (("backend", path), ("status", "sent")))
+
+    now = timezone.now()
+    failed = []
+    for alert in alerts:
+        if all(path in alert.sent_backends for path in get_backends()):
+            alert.sent_at = now
+            continue
+        alert.attempts += 1
+        alert.next_attempt_at = now + _retry_delay(alert.attempts)
+        alert.last_error = "\n".join(errors)
+        failed.append(alert)
+
+    if not failed:
+        return True
+
+    attempts = max(alert.attempts for alert in failed)
+    if attempts >= settings.ALERT_MAX_ATTEMPTS:
+        logger.error("Giving up low rating digest to user %s: %s", owner.pk, "; ".join(errors))
+    else:
+        logger.warning(
+            "Failed to deliver low rating digest to user %s, retry #%s: %s",
+            owner.pk,
+            attempts,
+            "; ".join(errors),
+        )
+    return False
@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+
+from .dates import as_date, datetime_range
+from .models import Answer, Point, Question
+from .stats import get_or_set_stats
+
+RATINGS = (1, 2, 3, 4, 5)
+
+
+def _percent(part, total):
+    return round(100 * part / total) if total else None
+
+
+def _summary(responses, histogram, rating_sum, yes, no):
+    rated = sum(histogram)
+    return {
+        "responses": responses,
+        "histogram": histogram,
+        "histogram_pct": [_percent(count, rated) for count in histogram],
+        "avg_rating": round(rating_sum / rated, 2) if rated else None,
+        # В духе NPS на пятибалльной шкале: доля пятерок минус доля 1–3
+        "nps": _percent(histogram[4] - sum(histogram[:3]), rated),
+        "yes": yes,
+        "no": no,
+        "yes_pct": _percent(yes, yes + no),
+    }
+
+
+def question_stats(point_ids=None, date_from=None, date_to=None):
+    """
+    Статистика по вопросам: гистограмма оценок 1–5, средняя, NPS-подобный
+    индекс, доля «Да» и число ответов — в целом и по каждому ПВЗ.
+
+    Одна группировка (вопрос, ПВЗ) с условной агрегацией Count(filter=Q(...)),
+    итоги по вопросу складываются из строк ПВЗ в Python.
+    """
+    answers = Answer.objects.filter(**datetime_range("survey__created_at", date_from, date_to))
+    if point_ids is not None:
+        answers = answers.filter(survey__point_id__in=point_ids)
+
+    rows = (
+        answers.values("question_id", "survey__point_id")
+        .annotate(
+            responses=Count("id"),
+            rating_sum=Sum("answer_rating", default=0),
+            yes=Count("id", filter=Q(answer_yes_no=True)),
+            no=Count("id", filter=Q(answer_yes_no=False)),
+            **{f"rating_{rating}": Count("id", filter=Q(answer_rating=rating)) for rating in RATINGS},
+        )
+        .order_by()
+    )
+
+    per_question = {}
+    for row in rows:
+        per_question.setdefault(row["question_id"], []).append(row)
+
+    questions = Question.objects.filter(pk__in=per_question).order_by("order", "id")
+    points = {
+        point["id"]: point
+        for point in Point.objects.filter(
+            pk__in={row["survey__point_id"] for rows in per_question.values() for row in rows}
+        ).values("id", "city", "name")
+    }
+
+    result = []
+    for question in questions:
+        point_rows = []
+        totals = {"responses": 0, "histogram": [0] * len(RATINGS), "rating_sum": 0, "yes": 0, "no": 0}
+
+        for row in per_question[question.pk]:
+            histogram = [row[f"rating_{rating}"] for rating in RATINGS]
+            point = points[row["survey__point_id"]]
+            point_rows.append({
+                "id": point["id"],
+                "city": point["city"],
+                "name": point["name"],
+                **_summary(row["responses"], histogram, row["rating_sum"], row["yes"], row["no"]),
+            })
+
+            totals["responses"] += row["responses"]
+            totals["rating_sum"] += row["rating_sum"]
+            totals["yes"] += row["yes"]
+            totals["no"] += row["no"]
+            totals["histogram"] = [a + b for a, b in zip(totals["histogram"], histogram)]
+
+        point_rows.sort(key=lambda item: (item["city"], item["name"]))
+        result.append({
+            "id": question.pk,
+            "text": question.text,
+            "type": question.type,
+            "type_display": question.get_type_display(),
+            **_summary(
+                totals["responses"],
+                totals["histogram"],
+                totals["rating_sum"],
+                totals["yes"],
+                totals["no"],
+            ),
+            "points": point_rows,
+        })
+
+    return result
+
+
+def get_question_stats(point_ids=None, date_from=None, date_to=None):
+    """
+    question_stats из общего кэша: одно значение на (набор ПВЗ, период) для
+    дашборда владельца и админки. Сбрасывается после прохождения опроса
+    в одном из этих ПВЗ (см. get_or_set_stats), поэтому группировка по Answer
+    выполняется на промахе, а не на каждой загрузке дашборда.
+    """
+    date_from = as_date(date_from) if date_from else None
+    date_to = as_date(date_to) if date_to else None
+    return get_or_set_stats(
+        point_ids,
+        f"questions:{date_from or ''}:{date_to or ''}",
+        lambda: question_stats(point_ids, date_from, date_to),
+        timeout=settings.QUESTION_STATS_CACHE_TIMEOUT,
+    )
@@ -0,0 +1,173 @@
+"""
+ASGI-версии публичных эндпоинтов (health, опрос, отправка).
+
+Подключаются вместо APIView при ASYNC_PUBLIC_API=True (по умолчанию под
+survey_app.asgi). Чтение — через async ORM, в поток уходят только
+транзакция записи, троттлинг и промахи кэша вопросов.
+"""
+
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, transaction
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import Throttled
+
+from .cache import questions_cache
+from .models import Survey
+from .serializers import (
+    SubmitSurveySerializer,
+    encode_json,
+    encode_questions,
+    render_survey_public,
+)
+from .throttling import acheck_throttles
+from .views import (
+    INVALID_IDEMPOTENCY_KEY,
+    PublicSurveyDetailView,
+    PublicSurveySubmitView,
+    complete_survey,
+    etag_matches,
+    get_completed_response,
+    get_idempotency_key,
+    get_survey_etag,
+    get_survey_questions,
+    health_payload,
+    load_survey_questions,
+)
+
+SURVEY_NOT_FOUND = "No Survey matches the given query."
+
+
+def in_thread_pool(func):
+    """
+    sync_to_async с thread_sensitive=False: вызовы идут в общий пул потоков,
+    а не в единственный поток воркера, и отправки не ждут друг друга.
+
+    У каждого потока пула свое соединение с БД, а request_finished закрывает
+    только соединения своего потока — поэтому устаревшие соединения
+    закрываются здесь, до и после вызова, по тем же правилам CONN_MAX_AGE.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(wrapper, thread_sensitive=False)
+
+
+acomplete_survey = in_thread_pool(transaction.atomic(complete_survey))
+aget_completed_response = in_thread_pool(get_completed_response)
+
+
+def _json(data, status=200, **headers):
+    return HttpResponse(
+        encode_json(data),
+        status=status,
+        content_type="application/json",
+        headers=headers,
+    )
+
+
+async def _throttled(request, throttle_classes):
+    wait = await acheck_throttles(request, throttle_classes)
+    if wait is None:
+        return None
+    return _json(
+        {"detail": Throttled(wait).detail}, status=429, **{"Retry-After": "%d" % wait}
+    )
+
+
+async def _completed_response(survey, idempotency_key):
+    data, status, headers = await aget_completed_response(survey, idempotency_key)
+    return _json(data, status=status, **headers)
+
+
+async def _get_survey(token):
+    try:
+        return await Survey.objects.select_related("point").aget(token=token)
+    except Survey.DoesNotExist:
+        return None
+
+
+@require_GET
+async def health_view(request):
+    return _json(health_payload())
+
+
+@require_GET
+async def public_survey_detail_view(request, token):
+    throttled = await _throttled(request, PublicSurveyDetailView.throttle_classes)
+    if throttled:
+        return throttled
+
+    survey = await _get_survey(token)
+    if survey is None:
+        return _json({"detail": SURVEY_NOT_FOUND}, status=404)
+
+    etag = get_survey_etag(survey, await questions_cache.aversion())
+    if etag_matches(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        key = ("json", survey.was_pickup, survey.was_tire_service)
+        questions_json = await questions_cache.aget_or_set(
+            key, lambda: encode_questions(get_survey_questions(survey))
+        )
+        response = HttpResponse(
+            render_survey_public(survey, questions_json),
+            content_type="application/json",
+        )
+
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def public_survey_submit_view(request, token):
+    throttled = await _throttled(request, PublicSurveySubmitView.throttle_classes)
+    if throttled:
+        return throttled
+
+    survey = await _get_survey(token)
+    if survey is None:
+        return _json({"detail": SURVEY_NOT_FOUND}, status=404)
+
+    idempotency_key = get_idempotency_key(request)
+    if idempotency_key is None:
+        return _json({"detail": INVALID_IDEMPOTENCY_KEY}, status=400)
+
+    if survey.completed:
+        return await _completed_response(survey, idempotency_key)
+
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError as exc:
+        return _json({"detail": f"JSON parse error - {exc}"}, status=400)
+
+    key = (survey.was_pickup, survey.was_tire_service)
+    questions = await questions_cache.aget_or_set(
+        key, lambda: load_survey_questions(*key)
+    )
+
+    # Валидация — чистый Python по закэшированным вопросам, без БД
+    serializer = SubmitSurveySerializer(
+        data=data,
+        context={"survey": survey, "questions": questions},
+    )
+    if not serializer.is_valid():
+        return _json(serializer.errors, status=400)
+
+    response_data = await acomplete_survey(survey, serializer, idempotency_key)
+    if response_data is None:
+        return await _completed_response(survey, idempotency_key)
+
+    return _json(response_data)
@@ -0,0 +1,144 @@
+import hashlib
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+QUESTIONS_VERSION = "questions"
+STATS_VERSION = "stats"
+
+
+def _version_key(name):
+    return f"survey:version:{name}"
+
+
+def get_version(name):
+    """
+    Текущая версия набора данных в общем кэше.
+
+    Начальное значение — time_ns(), а не 1: если ключ вытеснен из кэша,
+    новая версия не совпадет ни с одной из тех, что уже видели воркеры.
+    """
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(names):
+    """
+    Версии нескольких наборов одним обращением к общему кэшу (get_many).
+    """
+    keys = [_version_key(name) for name in names]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, timeout=None)
+        versions.update(cache.get_many(missing))
+    return [versions[key] for key in keys]
+
+
+def bump_version(name):
+    key = _version_key(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+        return cache.get(key)
+
+
+def get_or_set_versioned(names, key, loader, timeout=None):
+    """
+    Значение в общем кэше, привязанное к версиям names: bump_version любой
+    из них делает ранее сохраненный ключ недостижимым (он доживает по timeout).
+    """
+    versions = ",".join(f"{name}={version}" for name, version in zip(names, get_versions(names)))
+    digest = hashlib.md5(versions.encode(), usedforsecurity=False).hexdigest()
+    cache_key = f"survey:versioned:{digest}:{key}"
+    value = cache.get(cache_key)
+    if value is None:
+        value = loader()
+        cache.set(cache_key, value, timeout=timeout)
+    return value
+
+
+class LocalVersionedCache:
+    """
+    Кэш в памяти процесса, сбрасываемый при смене версии в общем кэше.
+
+    Версия перечитывается не чаще раза в check_interval секунд, так что
+    правки из админки доходят до всех воркеров с ограниченной задержкой.
+    """
+
+    def __init__(self, name, check_interval):
+        self.name = name
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._data = {}
+
+    def _is_fresh(self):
+        return (
+            self._version is not None
+            and time.monotonic() - self._checked_at < self.check_interval
+        )
+
+    def _sync(self):
+        if self._is_fresh():
+            return
+
+        now = time.monotonic()
+        version = get_version(self.name)
+        with self._lock:
+            if version != self._version:
+                self._data = {}
+                self._version = version
+            self._checked_at = now
+
+    def version(self):
+        self._sync()
+        return self._version
+
+    def get_or_set(self, key, loader):
+        self._sync()
+        data = self._data
+        try:
+            return data[key]
+        except KeyError:
+            value = data[key] = loader()
+            return value
+
+    # Для async-вьюх: в поток уходим только за версией или при промахе
+
+    async def aversion(self):
+        if not self._is_fresh():
+            await sync_to_async(self._sync)()
+        return self._version
+
+    async def aget_or_set(self, key, loader):
+        if not self._is_fresh():
+            await sync_to_async(self._sync)()
+        data = self._data
+        try:
+            return data[key]
+        except KeyError:
+            value = data[key] = await sync_to_async(loader)()
+            return value
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+            self._data = {}
+
+
+questions_cache = LocalVersionedCache(
+    QUESTIONS_VERSION,
+    check_interval=settings.QUESTIONS_CACHE_CHECK_INTERVAL,
+)
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+from .throttling import has_native_incr
+
+DEV_SECRET_KEYS = {"dev-secret-key", "changeme-secret"}
+
+
+@register(Tags.security, deploy=True)
+def check_production_settings(app_configs, **kwargs):
+    """
+    Проверки для manage.py check --deploy; gunicorn.conf.py не стартует при ошибках.
+    """
+    errors = []
+
+    if settings.DEBUG:
+        errors.append(
+            Error(
+                "DEBUG is enabled.",
+                hint="Set DEBUG=False: with DEBUG every query is kept in connection.queries.",
+                id="survey.E001",
+            )
+        )
+
+    if settings.SECRET_KEY in DEV_SECRET_KEYS:
+        errors.append(
+            Error(
+                "DJANGO_SECRET_KEY is a development placeholder.",
+                id="survey.E002",
+            )
+        )
+
+    for alias, database in settings.DATABASES.items():
+        if database.get("CONN_MAX_AGE") and not database.get("CONN_HEALTH_CHECKS"):
+            errors.append(
+                Error(
+                    f"Database '{alias}' keeps persistent connections without health checks.",
+                    hint="Set CONN_HEALTH_CHECKS=True or CONN_MAX_AGE=0.",
+                    id="survey.E003",
+                )
+            )
+
+    if settings.METRICS_ENABLED and not settings.METRICS_TOKEN:
+        errors.append(
+            Error(
+                "METRICS_TOKEN is not set.",
+                hint="Without a token /api/v1/public/metrics/ is denied when DEBUG is off; set METRICS_TOKEN.",
+                id="survey.E004",
+            )
+        )
+
+    if settings.DB_POOL and not any("pool" in db.get("OPTIONS", {}) for db in settings.DATABASES.values()):
+        errors.append(
+            Warning(
+                "DB_POOL is enabled but no database uses a connection pool.",
+                hint="Connection pooling is supported only for PostgreSQL.",
+                id="survey.W002",
+            )
+        )
+
+    if not has_native_incr():
+        errors.append(
+            Error(
+                "Default cache backend has no atomic incr.",
+                hint=(
+                    "Throttle counters lose increments under concurrency (and LocMem is per worker); "
+                    "set CACHE_URL to Redis or Memcached."
+                ),
+                id="survey.E005",
+            )
+        )
+
+    return errors
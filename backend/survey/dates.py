@@ -0,0 +1,43 @@
+import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+def as_date(value):
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+
+def day_start(value):
+    """
+    Полночь дня value (date или 'YYYY-MM-DD') в текущей таймзоне.
+    """
+    day = as_date(value)
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def datetime_range(field, date_from=None, date_to=None):
+    """
+    Фильтр по дням в виде полуоткрытого диапазона [date_from, date_to + 1 день).
+
+    В отличие от field__date__gte/lte не оборачивает колонку в приведение
+    к дате, поэтому индекс по field остается применим.
+    """
+    lookups = {}
+
+    start = day_start(date_from) if date_from else None
+    if start is not None:
+        lookups[f"{field}__gte"] = start
+
+    end = as_date(date_to) if date_to else None
+    if end is not None:
+        lookups[f"{field}__lt"] = day_start(end + datetime.timedelta(days=1))
+
+    return lookups
@@ -0,0 +1,54 @@
+from django.db import connections
+
+
+def connection_pool(connection):
+    """
+    Уже созданный пул соединения или None.
+
+    connection.pool у PostgreSQL — ленивое свойство: обращение к нему создает
+    (неоткрытый) пул. Поэтому сначала смотрим настройки, затем реестр пулов.
+    """
+    if not connection.settings_dict["OPTIONS"].get("pool"):
+        return None
+    return getattr(connection, "_connection_pools", {}).get(connection.alias)
+
+
+def pool_stats():
+    """
+    Состояние пулов соединений текущего воркера: {alias: статистика psycopg_pool}.
+
+    Базы без пула (и с пулом, который еще не создавался) не попадают
+    в результат. Счетчики не сбрасываются, так что health можно опрашивать
+    сколько угодно часто.
+    """
+    stats = {}
+    for connection in connections.all(initialized_only=False):
+        pool = connection_pool(connection)
+        if pool is not None:
+            stats[connection.alias] = pool.get_stats()
+    return stats
+
+
+def close_pools():
+    # Пул, открытый в мастере gunicorn, нельзя делить между воркерами после fork
+    for connection in connections.all(initialized_only=False):
+        if connection_pool(connection) is not None:
+            connection.close_pool()
+
+
+def is_pool_overflow(exception):
+    """
+    Ошибка — исчерпание пула (таймаут ожидания или переполненная очередь)?
+
+    Django заворачивает ошибки драйвера в свои, исходная лежит в __cause__.
+    """
+    try:
+        from psycopg_pool import PoolTimeout, TooManyRequests
+    except ImportError:
+        return False
+
+    while exception is not None:
+        if isinstance(exception, (PoolTimeout, TooManyRequests)):
+            return True
+        exception = exception.__cause__
+    return False
@@ -0,0 +1,111 @@
+import csv
+from itertools import groupby, islice
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from .dates import datetime_range
+from .models import Answer, Question
+
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+SURVEY_COLUMNS = ("Номер заказа", "Токен", "Город", "ПВЗ", "Создан", "Завершен в")
+
+
+class Echo:
+    """
+    Псевдобуфер для csv.writer: write() просто возвращает строку.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _format_datetime(value):
+    if value is None:
+        return ""
+    return timezone.localtime(value).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _format_answer(rating, yes_no, text):
+    if rating is not None:
+        return rating
+    if yes_no is not None:
+        return "Да" if yes_no else "Нет"
+    # Текст пишет клиент: не даем Excel принять его за формулу
+    if text.startswith(FORMULA_PREFIXES):
+        return "'" + text
+    return text
+
+
+def iter_answer_rows(point_ids=None, date_from=None, date_to=None, chunk_size=2000):
+    """
+    Строки выгрузки: шапка, затем по строке на завершенный опрос,
+    ответы разложены по колонкам вопросов.
+
+    Ответы читаются одним запросом через серверный курсор, отсортированными
+    по опросу, и группируются на лету — память не зависит от объема периода.
+    """
+    questions = list(Question.objects.order_by("order", "id").values_list("id", "text"))
+    column = {qid: index for index, (qid, _) in enumerate(questions)}
+
+    yield [*SURVEY_COLUMNS, *(f"{qid}. {text}" for qid, text in questions)]
+
+    answers = Answer.objects.filter(
+        survey__completed=True,
+        **datetime_range("survey__created_at", date_from, date_to),
+    )
+    if point_ids is not None:
+        answers = answers.filter(survey__point_id__in=point_ids)
+
+    rows = answers.order_by("survey__created_at", "survey_id").values_list(
+        "survey_id",
+        "survey__order_number",
+        "survey__token",
+        "survey__point__city",
+        "survey__point__name",
+        "survey__created_at",
+        "survey__completed_at",
+        "question_id",
+        "answer_rating",
+        "answer_yes_no",
+        "answer_text",
+    )
+
+    for _, survey_answers in groupby(rows.iterator(chunk_size=chunk_size), key=lambda row: row[0]):
+        values = [""] * len(questions)
+        for row in survey_answers:
+            values[column[row[7]]] = _format_answer(*row[8:])
+
+        yield [
+            row[1],
+            row[2],
+            row[3],
+            row[4],
+            _format_datetime(row[5]),
+            _format_datetime(row[6]),
+            *values,
+        ]
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+    # BOM — чтобы Excel открыл кириллицу без танцев с кодировкой
+    yield "\ufeff"
+    for row in rows:
+        yield writer.writerow(row)
+
+
+async def aiter_chunks(chunks, batch_size=64):
+    """
+    Async-итератор поверх синхронного — для StreamingHttpResponse под ASGI.
+
+    Синхронный итератор ASGIHandler сначала вычитывает целиком
+    (sync_to_async(list)), и память выгрузки перестает быть плоской. Здесь
+    каждая пачка строк читается отдельным вызовом в потоке запроса
+    (thread_sensitive): в нем открыт серверный курсор.
+    """
+    iterator = iter(chunks)
+    take = sync_to_async(lambda: list(islice(iterator, batch_size)))
+    while batch := await take():
+        yield "".join(batch)
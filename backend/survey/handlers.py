@@ -0,0 +1,16 @@
+from .alerts import record_low_ratings
+from .models import OutboxEvent, Survey
+from .outbox import handler
+from .stats import record_survey_completed, survey_ratings
+
+
+@handler(OutboxEvent.Kind.SURVEY_COMPLETED)
+def survey_completed(payload):
+    survey = Survey.objects.filter(pk=payload["survey_id"]).only("point_id", "created_at", "completed").first()
+    if survey is None:
+        # Опрос удалили раньше, чем воркер дошел до события
+        return
+    # Сводка — по текущему состоянию опроса: правки, сделанные до обработки
+    # события, учли только выдачу (см. stats.completion_accounted)
+    record_survey_completed(survey, survey_ratings(survey.pk))
+    record_low_ratings(survey, payload["ratings"])
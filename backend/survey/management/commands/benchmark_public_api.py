@@ -0,0 +1,460 @@
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from asgiref.sync import async_to_sync
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from django.urls import include, path
+
+from survey.models import Point, Question, Survey
+from survey.urls import async_public_urlpatterns
+
+SCENARIOS = ("detail", "submit")
+MODES = ("in_process", "wsgi", "asgi")
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, wall_time, errors, queries=None):
+    result = {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall_time, 2) if wall_time else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+    if queries is not None:
+        result["queries_per_request"] = round(sum(queries) / len(queries), 2)
+        result["max_queries"] = max(queries)
+    return result
+
+
+def aggregate(summaries):
+    """
+    Сводка нескольких прогонов: задержки и RPS — медиана по прогонам,
+    запросы и ошибки — сумма, чтобы один шумный прогон не решал исход сравнения.
+    """
+    result = {
+        "requests": sum(summary["requests"] for summary in summaries),
+        "errors": sum(summary["errors"] for summary in summaries),
+        "runs": len(summaries),
+    }
+    for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "queries_per_request"):
+        values = [summary[key] for summary in summaries if summary.get(key) is not None]
+        if values:
+            result[key] = round(statistics.median(values), 3)
+    if any("max_queries" in summary for summary in summaries):
+        result["max_queries"] = max(summary.get("max_queries", 0) for summary in summaries)
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark public survey endpoints (detail GET, submit POST) on a throwaway '
+        'test database: in-process, through the WSGI app and through the ASGI app '
+        'with async views, with concurrent clients'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=50)
+        parser.add_argument('--questions', type=int, default=10)
+        parser.add_argument('--surveys', type=int, default=4500)
+        parser.add_argument('--requests', type=int, default=500, help='Requests per scenario and run')
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per mode; results and the baseline check use the median of runs',
+        )
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent WSGI clients')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default='bench_output.json')
+        parser.add_argument('--baseline', help='Previous results JSON to compare against')
+        parser.add_argument(
+            '--max-regression',
+            type=float,
+            default=0.2,
+            help='Allowed relative growth of p95 latency vs baseline (0.2 = +20%%)',
+        )
+        parser.add_argument(
+            '--regression-floor-ms',
+            type=float,
+            default=1.0,
+            help='p95 growth below this absolute value (ms) is treated as noise',
+        )
+        parser.add_argument(
+            '--min-requests',
+            type=int,
+            default=1000,
+            help='Minimum requests per scenario (over all runs) for the p95 check',
+        )
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        if options['surveys'] < 3 * options['requests'] * options['repeat']:
+            raise CommandError(
+                '--surveys must be at least 3 x --requests x --repeat (each submit consumes a survey)'
+            )
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as fh:
+                baseline = json.load(fh)
+
+        if connection.vendor == 'sqlite':
+            # Общая in-memory база SQLite блокирует таблицы при параллельной записи,
+            # а отложенные транзакции падают с "database is locked" вместо ожидания
+            connection.settings_dict['TEST']['NAME'] = connection.settings_dict['TEST']['NAME'] or (
+                os.path.join(tempfile.gettempdir(), 'survey_benchmark.sqlite3')
+            )
+            connection.settings_dict['OPTIONS'].setdefault('transaction_mode', 'IMMEDIATE')
+            connection.settings_dict['OPTIONS'].setdefault('timeout', 30)
+
+        setup_test_environment()
+        old_config = setup_databases(
+            verbosity=0,
+            interactive=False,
+            keepdb=options['keepdb'],
+        )
+        try:
+            rng = random.Random(options['seed'])
+            surveys = self._seed(rng, options)
+            runs = []
+            requests = options['requests']
+            for run in range(options['repeat']):
+                # Каждому прогону — свои опросы: отправка расходует опрос
+                offset = 3 * requests * run
+                runs.append({
+                    "in_process": self._run_in_process(
+                        rng, surveys[offset:offset + requests], requests
+                    ),
+                    "wsgi": self._run_wsgi(
+                        rng,
+                        surveys[offset + requests:offset + 2 * requests],
+                        requests,
+                        options['concurrency'],
+                    ),
+                    "asgi": self._run_asgi(
+                        rng,
+                        surveys[offset + 2 * requests:offset + 3 * requests],
+                        requests,
+                        options['concurrency'],
+                    ),
+                })
+            results = {
+                "params": {
+                    name: options[name]
+                    for name in (
+                        'points', 'questions', 'surveys', 'requests', 'repeat', 'concurrency', 'seed',
+                    )
+                },
+                **{
+                    mode: {
+                        scenario: aggregate([run[mode][scenario] for run in runs])
+                        for scenario in SCENARIOS
+                    }
+                    for mode in MODES
+                },
+                "runs": runs,
+            }
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+        for mode in MODES:
+            for scenario in SCENARIOS:
+                self.stdout.write(f'{mode:>10} {scenario:>6}: {results[mode][scenario]}')
+        self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+        if baseline is not None:
+            self._check_regressions(results, baseline, options)
+
+    # =========================
+    # ДАННЫЕ
+    # =========================
+
+    def _seed(self, rng, options):
+        points = Point.objects.bulk_create(
+            Point(name=f'ПВЗ {i}', city=f'Город {i % 20}') for i in range(options['points'])
+        )
+
+        categories = list(Question.Category.values)
+        types = list(Question.Type.values)
+        Question.objects.bulk_create(
+            Question(
+                text=f'Вопрос {i}',
+                category=categories[i % len(categories)],
+                type=types[i % len(types)],
+                is_required=i % 2 == 0,
+                order=i,
+            )
+            for i in range(options['questions'])
+        )
+
+        surveys = Survey.objects.bulk_create(
+            (
+                Survey(
+                    point=rng.choice(points),
+                    order_number=f'BENCH-{i}',
+                    was_pickup=rng.random() < 0.7,
+                    was_tire_service=rng.random() < 0.4,
+                )
+                for i in range(options['surveys'])
+            ),
+            batch_size=1000,
+        )
+        rng.shuffle(surveys)
+        return surveys
+
+    def _answers(self, rng, client_get):
+        questions = client_get()["questions"]
+        answers = []
+        for question in questions:
+            if question["type"] == Question.Type.RATING:
+                answer = rng.randint(1, 5)
+            elif question["type"] == Question.Type.YES_NO:
+                answer = rng.random() < 0.8
+            else:
+                answer = 'Все хорошо'
+            answers.append({"question_id": question["id"], "answer": answer})
+        return {"answers": answers}
+
+    # =========================
+    # IN-PROCESS
+    # =========================
+
+    def _run_in_process(self, rng, surveys, requests):
+        client = Client()
+        results = {}
+
+        for scenario in SCENARIOS:
+            latencies, queries, errors = [], [], 0
+            started = time.perf_counter()
+
+            for i, survey in enumerate(surveys[:requests]):
+                # Уникальный IP на запрос — троттлинг не должен вмешиваться в замер
+                extra = {"REMOTE_ADDR": f'10.0.{i // 250}.{i % 250}'}
+                url = f'/api/v1/public/surveys/{survey.token}/'
+
+                if scenario == "submit":
+                    payload = self._answers(rng, lambda: client.get(url, **extra).json())
+
+                with CaptureQueriesContext(connection) as ctx:
+                    t0 = time.perf_counter()
+                    if scenario == "detail":
+                        response = client.get(url, **extra)
+                    else:
+                        response = client.post(
+                            url + 'submit/', payload, content_type='application/json', **extra
+                        )
+                    latencies.append(time.perf_counter() - t0)
+
+                queries.append(len(ctx.captured_queries))
+                errors += response.status_code != 200
+
+            results[scenario] = summarize(
+                latencies, time.perf_counter() - started, errors, queries
+            )
+
+        return results
+
+    # =========================
+    # WSGI + КОНКУРЕНТНЫЕ КЛИЕНТЫ
+    # =========================
+
+    def _run_wsgi(self, rng, surveys, requests, concurrency):
+        server = make_server(
+            '127.0.0.1', 0, WSGIHandler(),
+            server_class=_ThreadingWSGIServer,
+            handler_class=_QuietHandler,
+        )
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base_url = f'http://localhost:{server.server_port}/api/v1/public/surveys'
+
+        def call(url, ident, body=None):
+            request = urllib.request.Request(
+                url,
+                data=json.dumps(body).encode() if body is not None else None,
+                headers={'Content-Type': 'application/json', 'X-Forwarded-For': ident},
+            )
+            t0 = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request) as response:
+                    data = response.read()
+                    ok = response.status == 200
+            except urllib.error.HTTPError as exc:
+                data, ok = exc.read(), False
+            return time.perf_counter() - t0, ok, data
+
+        results = {}
+        try:
+            for scenario in SCENARIOS:
+                jobs = []
+                for i, survey in enumerate(surveys[:requests]):
+                    ident = f'10.1.{i // 250}.{i % 250}'
+                    url = f'{base_url}/{survey.token}/'
+                    body = None
+                    if scenario == "submit":
+                        body = self._answers(rng, lambda: json.loads(call(url, ident)[2]))
+                        url += 'submit/'
+                    jobs.append((url, ident, body))
+
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    outcomes = list(pool.map(lambda job: call(*job), jobs))
+                wall_time = time.perf_counter() - started
+
+                latencies = [latency for latency, _, _ in outcomes]
+                errors = sum(1 for _, ok, _ in outcomes if not ok)
+                results[scenario] = summarize(latencies, wall_time, errors)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        return results
+
+    # =========================
+    # ASGI + ASYNC-ВЬЮХИ
+    # =========================
+
+    def _run_asgi(self, rng, surveys, requests, concurrency):
+        # Тот же путь, что под uvicorn: ASGIHandler и нативные async-вьюхи
+        urlconf = ModuleType('benchmark_asgi_urls')
+        urlconf.urlpatterns = [path('api/v1/', include(async_public_urlpatterns))]
+        with override_settings(ROOT_URLCONF=urlconf):
+            return async_to_sync(self._arun_asgi)(rng, surveys, requests, concurrency)
+
+    async def _arun_asgi(self, rng, surveys, requests, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(url, ident, body=None):
+            async with semaphore:
+                t0 = time.perf_counter()
+                if body is None:
+                    response = await client.get(url, headers={'X-Forwarded-For': ident})
+                else:
+                    response = await client.post(
+                        url, body, content_type='application/json',
+                        headers={'X-Forwarded-For': ident},
+                    )
+                return time.perf_counter() - t0, response.status_code == 200, response.content
+
+        results = {}
+        for scenario in SCENARIOS:
+            jobs = []
+            for i, survey in enumerate(surveys[:requests]):
+                ident = f'10.2.{i // 250}.{i % 250}'
+                url = f'/api/v1/public/surveys/{survey.token}/'
+                body = None
+                if scenario == "submit":
+                    questions = json.loads((await call(url, ident))[2])
+                    body = self._answers(rng, lambda: questions)
+                    url += 'submit/'
+                jobs.append((url, ident, body))
+
+            started = time.perf_counter()
+            outcomes = await asyncio.gather(*(call(*job) for job in jobs))
+            wall_time = time.perf_counter() - started
+
+            latencies = [latency for latency, _, _ in outcomes]
+            errors = sum(1 for _, ok, _ in outcomes if not ok)
+            results[scenario] = summarize(latencies, wall_time, errors)
+
+        return results
+
+    # =========================
+    # РЕГРЕССИИ
+    # =========================
+
+    def _check_regressions(self, results, baseline, options):
+        failures = []
+        max_regression = options['max_regression']
+        floor_ms = options['regression_floor_ms']
+        min_requests = options['min_requests']
+
+        for mode in MODES:
+            for scenario in SCENARIOS:
+                current = results[mode][scenario]
+                previous = baseline.get(mode, {}).get(scenario)
+                if not previous:
+                    continue
+
+                # На малой выборке p95 — это несколько самых медленных запросов,
+                # их разброс между прогонами больше любого порога
+                sample = min(current["requests"], previous["requests"])
+                if sample < min_requests:
+                    self.stdout.write(self.style.WARNING(
+                        f'{mode}/{scenario}: p95 not compared, {sample} requests < --min-requests {min_requests}'
+                    ))
+                else:
+                    limit = max(
+                        previous["p95_ms"] * (1 + max_regression),
+                        previous["p95_ms"] + floor_ms,
+                    )
+                    if current["p95_ms"] > limit:
+                        failures.append(
+                            f'{mode}/{scenario}: p95 {current["p95_ms"]}ms > {limit:.3f}ms'
+                        )
+
+                if current.get("queries_per_request", 0) > previous.get("queries_per_request", float("inf")):
+                    failures.append(
+                        f'{mode}/{scenario}: queries/request '
+                        f'{current["queries_per_request"]} > {previous["queries_per_request"]}'
+                    )
+
+                if current["errors"] > previous["errors"]:
+                    failures.append(
+                        f'{mode}/{scenario}: errors {current["errors"]} > {previous["errors"]}'
+                    )
+
+        if failures:
+            raise CommandError('Performance regression:\n' + '\n'.join(failures))
+
+        self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
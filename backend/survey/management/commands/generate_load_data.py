@@ -0,0 +1,303 @@
+import itertools
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from survey.cache import bump_version
+from survey.models import Answer, OwnerProfile, Point, Question, Survey
+from survey.ownership import OWNERSHIP_VERSION
+from survey.stats import rebuild_point_daily_stats
+
+CITIES = (
+    'Москва', 'Санкт-Петербург', 'Новосибирск', 'Екатеринбург', 'Казань',
+    'Нижний Новгород', 'Челябинск', 'Самара', 'Омск', 'Ростов-на-Дону',
+    'Уфа', 'Красноярск', 'Воронеж', 'Пермь', 'Волгоград',
+)
+
+COMMENTS = (
+    'Все отлично, спасибо!',
+    'Долго ждал выдачи',
+    'Вежливый персонал',
+    'Не было нужного размера шин',
+    'Удобное расположение',
+    'Очередь на кассе',
+)
+
+# Базовое распределение оценок 1..5; у каждого ПВЗ оно сдвинуто своим «качеством»
+RATING_WEIGHTS = (0.04, 0.04, 0.10, 0.27, 0.55)
+
+# Часы выдачи с весами: пик днем и вечером
+HOUR_WEIGHTS = [0, 0, 0, 0, 0, 0, 0, 0, 1, 3, 5, 6, 7, 7, 6, 6, 7, 8, 9, 8, 6, 3, 1, 0]
+
+SURVEY_COLUMNS = (
+    'token', 'order_number', 'point_id', 'was_pickup', 'was_tire_service',
+    'completed', 'created_at', 'completed_at',
+)
+ANSWER_COLUMNS = (
+    'survey_id', 'question_id', 'answer_rating', 'answer_yes_no', 'answer_text', 'created_at',
+)
+
+
+@contextmanager
+def explicit_created_at(*models):
+    """
+    bulk_create перезаписывает auto_now_add текущим временем; на время
+    генерации отключаем, чтобы опросы были распределены по месяцам.
+    """
+    fields = [model._meta.get_field('created_at') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a production-scale synthetic dataset: points, owners, surveys and answers '
+        '(deterministic for a given --seed and --end-date)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=2000)
+        parser.add_argument('--owners', type=int, default=500)
+        parser.add_argument('--points-per-owner', type=int, default=5)
+        parser.add_argument('--surveys', type=int, default=1_000_000)
+        parser.add_argument('--days', type=int, default=180, help='Spread surveys over this many days')
+        parser.add_argument('--end-date', help='Last day of the period (YYYY-MM-DD), default today')
+        parser.add_argument('--completion-rate', type=float, default=0.35)
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Surveys per transaction')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--copy', action='store_true', help='Load surveys and answers with PostgreSQL COPY')
+        parser.add_argument(
+            '--skip-stats',
+            action='store_true',
+            help='Do not rebuild the daily stats rollup afterwards',
+        )
+
+    def handle(self, *args, **options):
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy requires PostgreSQL')
+        if not 0 <= options['completion_rate'] <= 1:
+            raise CommandError('--completion-rate must be between 0 and 1')
+
+        end_date = timezone.localdate()
+        if options['end_date']:
+            end_date = parse_date(options['end_date'])
+            if end_date is None:
+                raise CommandError(f'Invalid end_date: {options["end_date"]}')
+
+        # Значение, уникальное для сида: повторный запуск с другим сидом не конфликтует
+        self.tag = f'LOAD{options["seed"]}'
+        if Point.objects.filter(name__startswith=f'{self.tag} ').exists():
+            raise CommandError(f'Data for --seed {options["seed"]} already exists')
+
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+
+        call_command('seed_initial_data', verbosity=0)
+        questions = list(Question.objects.filter(is_active=True).order_by('order', 'id'))
+        if not questions:
+            raise CommandError('No active questions')
+
+        points = self._create_points(rng, options['points'])
+        self.stdout.write(f'Points: {len(points)}')
+
+        owners = self._create_owners(rng, points, options['owners'], options['points_per_owner'])
+        self.stdout.write(f'Owners: {owners}')
+
+        # Накопленные веса для rng.choices: считаются один раз на все пачки
+        load = list(itertools.accumulate(point.load for point in points))
+
+        period_start = timezone.make_aware(
+            datetime.combine(end_date - timedelta(days=options['days'] - 1), datetime.min.time())
+        )
+
+        surveys = answers = 0
+        with explicit_created_at(Survey, Answer):
+            for offset in range(0, options['surveys'], options['chunk_size']):
+                size = min(options['chunk_size'], options['surveys'] - offset)
+                created = self._create_chunk(
+                    rng, options, points, load, questions, period_start, offset, size
+                )
+                surveys += size
+                answers += created
+                self.stdout.write(
+                    f'Surveys: {surveys}/{options["surveys"]}, answers: {answers} '
+                    f'({time.perf_counter() - started:.0f}s)'
+                )
+
+        if not options['skip_stats']:
+            rows = rebuild_point_daily_stats()
+            self.stdout.write(f'Daily stats rows: {rows}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {surveys} surveys and {answers} answers in {time.perf_counter() - started:.0f}s'
+        ))
+
+    # =========================
+    # ПВЗ И ВЛАДЕЛЬЦЫ
+    # =========================
+
+    def _create_points(self, rng, count):
+        points = Point.objects.bulk_create(
+            (
+                Point(name=f'{self.tag} ПВЗ {i}', city=rng.choice(CITIES))
+                for i in range(count)
+            ),
+            batch_size=1000,
+        )
+
+        # Загрузка ПВЗ — длинный хвост: немного очень загруженных, много тихих.
+        # Качество сдвигает распределение оценок: есть стабильно плохие ПВЗ.
+        for point in points:
+            point.load = rng.paretovariate(1.5)
+            point.quality = rng.gauss(0, 1)
+        return points
+
+    def _create_owners(self, rng, points, count, points_per_owner):
+        if not count:
+            return 0
+
+        # Пароли непригодные: нагрузочные владельцы не входят в систему
+        users = User.objects.bulk_create(
+            (
+                User(username=f'{self.tag.lower()}_owner_{i}', password=make_password(None))
+                for i in range(count)
+            ),
+            batch_size=1000,
+        )
+        profiles = OwnerProfile.objects.bulk_create(
+            (OwnerProfile(user=user) for user in users),
+            batch_size=1000,
+        )
+
+        Through = OwnerProfile.points.through
+        per_owner = min(points_per_owner, len(points))
+        Through.objects.bulk_create(
+            (
+                Through(ownerprofile_id=profile.pk, point_id=point.pk)
+                for profile in profiles
+                for point in rng.sample(points, per_owner)
+            ),
+            batch_size=5000,
+        )
+
+        # bulk_create не шлет m2m_changed
+        bump_version(OWNERSHIP_VERSION)
+        return len(profiles)
+
+    # =========================
+    # ОПРОСЫ И ОТВЕТЫ
+    # =========================
+
+    def _create_chunk(self, rng, options, points, load, questions, period_start, offset, size):
+        seconds = options['days'] * 86400
+
+        surveys = []
+        for i in range(offset, offset + size):
+            point = rng.choices(points, cum_weights=load)[0]
+            day = rng.randrange(options['days'])
+            hour = rng.choices(range(24), weights=HOUR_WEIGHTS)[0]
+            created_at = period_start + timedelta(days=day, hours=hour, seconds=rng.randrange(3600))
+            completed = rng.random() < options['completion_rate']
+            completed_at = None
+            if completed:
+                # Большинство отвечает в первые часы после SMS
+                completed_at = created_at + timedelta(seconds=min(rng.expovariate(1 / 7200), seconds))
+
+            survey = Survey(
+                token=uuid.UUID(int=rng.getrandbits(128), version=4),
+                order_number=f'{self.tag}-{i}',
+                point_id=point.pk,
+                was_pickup=rng.random() < 0.7,
+                was_tire_service=rng.random() < 0.35,
+                completed=completed,
+                created_at=created_at,
+                completed_at=completed_at,
+            )
+            survey.quality = point.quality
+            surveys.append(survey)
+
+        with transaction.atomic():
+            if options['copy']:
+                self._copy_surveys(surveys)
+            else:
+                Survey.objects.bulk_create(surveys, batch_size=options['chunk_size'])
+
+            answers = [
+                answer
+                for survey in surveys
+                if survey.completed
+                for answer in self._answers(rng, survey, questions)
+            ]
+
+            if options['copy']:
+                self._copy(Answer, ANSWER_COLUMNS, answers)
+            else:
+                Answer.objects.bulk_create(answers, batch_size=options['chunk_size'])
+
+        return len(answers)
+
+    def _answers(self, rng, survey, questions):
+        categories = {Question.Category.COMMON}
+        if survey.was_pickup:
+            categories.add(Question.Category.PICKUP)
+        if survey.was_tire_service:
+            categories.add(Question.Category.TIRE_SERVICE)
+
+        # Плохой ПВЗ чаще получает низкие оценки, хороший — пятерки
+        shift = survey.quality
+        weights = [
+            max(weight * (1 + shift * (rating - 3) / 2), 0.005)
+            for rating, weight in enumerate(RATING_WEIGHTS, start=1)
+        ]
+
+        for question in questions:
+            if question.category not in categories:
+                continue
+            if not question.is_required and rng.random() < 0.4:
+                continue
+
+            answer = Answer(
+                survey_id=survey.pk,
+                question_id=question.pk,
+                created_at=survey.completed_at,
+            )
+            if question.type == Question.Type.RATING:
+                answer.answer_rating = rng.choices((1, 2, 3, 4, 5), weights=weights)[0]
+            elif question.type == Question.Type.YES_NO:
+                answer.answer_yes_no = rng.random() < 0.85
+            else:
+                answer.answer_text = rng.choice(COMMENTS)
+            yield answer
+
+    def _copy_surveys(self, surveys):
+        self._copy(Survey, SURVEY_COLUMNS, surveys)
+
+        # COPY не возвращает id — добираем их по токенам
+        ids = dict(
+            Survey.objects.filter(token__in=[survey.token for survey in surveys]).values_list('token', 'pk')
+        )
+        for survey in surveys:
+            survey.pk = ids[survey.token]
+
+    def _copy(self, model, columns, objects):
+        table = connection.ops.quote_name(model._meta.db_table)
+        column_list = ', '.join(connection.ops.quote_name(column) for column in columns)
+        with connection.cursor() as cursor:
+            with cursor.copy(f'COPY {table} ({column_list}) FROM STDIN') as copy:
+                for obj in objects:
+                    copy.write_row([getattr(obj, column) for column in columns])
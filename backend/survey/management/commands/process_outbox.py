@@ -0,0 +1,59 @@
+import signal
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from survey.alerts import send_due_digests
+from survey.outbox import process_batch, purge_processed
+
+
+class Command(BaseCommand):
+    help = 'Run outbox worker: execute post-submit side effects with retries, send alert digests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE)
+        parser.add_argument('--max-attempts', type=int, default=settings.OUTBOX_MAX_ATTEMPTS)
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.OUTBOX_POLL_INTERVAL,
+            help='Seconds to sleep when the queue is empty',
+        )
+        parser.add_argument('--once', action='store_true', help='Drain ready events and exit')
+        parser.add_argument(
+            '--purge',
+            action='store_true',
+            help='Delete done events older than OUTBOX_RETENTION_DAYS and exit',
+        )
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            deleted = purge_processed(timedelta(days=settings.OUTBOX_RETENTION_DAYS))
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} processed events'))
+            return
+
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        total = 0
+        while self.running:
+            # Между пачками: соединение могло протухнуть или превысить CONN_MAX_AGE
+            close_old_connections()
+            processed = process_batch(options['batch_size'], options['max_attempts'])
+            total += processed
+            send_due_digests()
+
+            if processed < options['batch_size']:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} events'))
+
+    def stop(self, signum, frame):
+        # Текущая пачка дорабатывает, новая не берется
+        self.running = False
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from survey.stats import rebuild_point_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-point daily rating stats from surveys and answers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', help='First survey creation date (YYYY-MM-DD)')
+        parser.add_argument('--date-to', help='Last survey creation date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        dates = {}
+        for name in ('date_from', 'date_to'):
+            value = options[name]
+            if value and parse_date(value) is None:
+                raise CommandError(f'Invalid {name}: {value}')
+            dates[name] = value
+
+        rows = rebuild_point_daily_stats(**dates)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} daily stats rows'))
@@ -0,0 +1,123 @@
+import os
+import shutil
+import threading
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from prometheus_client.mmap_dict import MmapedDict
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Задается до импорта prometheus_client (gunicorn.conf.py): с ним каждый воркер
+# пишет значения в mmap-файлы каталога, а /metrics суммирует все файлы
+MULTIPROCESS_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Registry:
+    """
+    Метрики приложения.
+
+    Без PROMETHEUS_MULTIPROC_DIR — в памяти процесса (runserver, один воркер).
+    С ним значения всех воркеров суммируются при отдаче, поэтому скрейп,
+    попавший в любой воркер, видит весь трафик, а счетчики не сбрасываются
+    при перезапуске воркера по max_requests (см. archive_process).
+    """
+
+    HISTOGRAMS = {
+        "survey_http_request_duration_seconds": ("Request wall time", LATENCY_BUCKETS),
+        "survey_http_db_queries": ("DB queries per request", QUERY_BUCKETS),
+        "survey_http_db_duration_seconds": ("DB time per request", LATENCY_BUCKETS),
+        "survey_http_response_size_bytes": ("Response body size", SIZE_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # В multiprocess-режиме метрики не регистрируются: отдает MultiProcessCollector
+        self._registry = None if MULTIPROCESS_DIR else CollectorRegistry()
+        self._histograms = {
+            name: Histogram(name, help_text, ("view", "method"), buckets=buckets, registry=self._registry)
+            for name, (help_text, buckets) in self.HISTOGRAMS.items()
+        }
+        self._requests = Counter(
+            "survey_http_requests_total",
+            "Requests by view and status",
+            ("view", "method", "status"),
+            registry=self._registry,
+        )
+        self._counters = {}
+
+    def observe_request(self, view, method, status, duration, queries, db_time, size):
+        histograms = self._histograms
+        histograms["survey_http_request_duration_seconds"].labels(view, method).observe(duration)
+        if queries is not None:
+            histograms["survey_http_db_queries"].labels(view, method).observe(queries)
+            histograms["survey_http_db_duration_seconds"].labels(view, method).observe(db_time)
+        if size is not None:
+            histograms["survey_http_response_size_bytes"].labels(view, method).observe(size)
+
+        self._requests.labels(view, method, str(status)).inc()
+
+    def _counter(self, name, labelnames):
+        counter = self._counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.get(name)
+                if counter is None:
+                    counter = self._counters[name] = Counter(
+                        name, name, labelnames, registry=self._registry
+                    )
+        return counter
+
+    def inc(self, name, labels=(), value=1):
+        counter = self._counter(name, tuple(key for key, _ in labels))
+        if labels:
+            counter = counter.labels(*(value for _, value in labels))
+        counter.inc(value)
+
+    def render(self):
+        registry = self._registry
+        if registry is None:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry, path=MULTIPROCESS_DIR)
+        return generate_latest(registry).decode()
+
+
+def reset_multiprocess_dir(path):
+    """
+    Очищает каталог метрик при старте мастера: файлы прошлого запуска
+    не должны попадать в новые значения.
+    """
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def archive_process(pid, path):
+    """
+    Переносит значения завершившегося воркера в архивные файлы и удаляет его
+    файлы. Счетчики остаются монотонными, а число файлов (и время отдачи
+    /metrics) не растет с каждым перезапуском по max_requests.
+
+    Вызывается только из мастера gunicorn (child_exit), поэтому архив
+    пишет один процесс.
+    """
+    for typ in ("counter", "histogram"):
+        filename = os.path.join(path, f"{typ}_{pid}.db")
+        if not os.path.exists(filename):
+            continue
+
+        archive = MmapedDict(os.path.join(path, f"{typ}_archive.db"))
+        try:
+            # Гистограммы хранятся по корзинам без накопления — складываются как счетчики
+            for key, value, timestamp, _ in MmapedDict.read_all_values_from_file(filename):
+                archive.write_value(key, archive.read_value(key)[0] + value, timestamp)
+        finally:
+            archive.close()
+        os.remove(filename)
+
+    multiprocess.mark_process_dead(pid, path)
+
+
+registry = Registry()
@@ -1,15 +1,229 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import JsonResponse
 from django.shortcuts import redirect
 
+from .db import is_pool_overflow
+from .metrics import registry
+from .ownership import is_owner
+from .routers import finish_writes, mark_writes, replica_configured
+
+slow_request_logger = logging.getLogger("survey.slow_requests")
+
+
 class BlockOwnerAdminMiddleware:
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        # Сначала путь: пользователь и профиль грузятся только для /admin
+        if request.path.startswith("/admin"):
+            if is_owner(request.user):
+                return redirect("/dashboard/")
+
+        return self.get_response(request)
 
-        if request.user.is_authenticated:
-            if hasattr(request.user, "ownerprofile"):
-                if request.path.startswith("/admin"):
-                    return redirect("/dashboard/")
+    async def __acall__(self, request):
+        if request.path.startswith("/admin"):
+            user = await request.auser()
+            if await sync_to_async(is_owner)(user):
+                return redirect("/dashboard/")
+
+        return await self.get_response(request)
+
+
+class DatabasePoolOverflowMiddleware:
+    """
+    Пул соединений исчерпан — отвечаем 503 с Retry-After, а не 500.
+
+    При всплеске (массовая рассылка SMS) клиенты повторят запрос позже,
+    а Postgres не упирается в max_connections.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
+    def __call__(self, request):
         return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not is_pool_overflow(exception):
+            return None
+
+        registry.inc("survey_db_pool_overflow_total")
+        response = JsonResponse({"detail": "Service temporarily overloaded."}, status=503)
+        response["Retry-After"] = "1"
+        return response
+
+
+class ReplicaStickyMiddleware:
+    """
+    После записи сессия какое-то время читает с primary (REPLICA_STICKY_SECONDS),
+    чтобы владелец сразу видел результат своего действия, а не отставшую реплику.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = mark_writes()
+        try:
+            return self.get_response(request)
+        finally:
+            finish_writes(request, token)
+
+    async def __acall__(self, request):
+        token = mark_writes()
+        try:
+            return await self.get_response(request)
+        finally:
+            finish_writes(request, token)
+
+
+class _QueryRecorder:
+    """
+    execute_wrapper: считает запросы и время в БД, хранит самые медленные SQL.
+    """
+
+    def __init__(self, keep):
+        self.keep = keep
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if len(self.slowest) < self.keep:
+                self.slowest.append((elapsed, sql))
+            elif elapsed > self.slowest[-1][0]:
+                self.slowest[-1] = (elapsed, sql)
+            else:
+                return
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+
+
+class RequestMetricsMiddleware:
+    """
+    Время запроса, число и время запросов к БД, размер ответа — по имени URL.
+
+    Агрегаты в памяти воркера отдаются в формате Prometheus (metrics_view).
+    Запросы дольше SLOW_REQUEST_MS пишутся в лог survey.slow_requests
+    вместе с самыми медленными SQL.
+
+    В async-режиме запросы к БД выполняются в других потоках, поэтому
+    считаются только время и размер ответа.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        recorder = _QueryRecorder(keep=settings.SLOW_REQUEST_SQL_LIMIT)
+        started = time.perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        self._record(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        response = await self.get_response(request)
+
+        self._record(request, response, time.perf_counter() - started, None)
+        return response
+
+    def _record(self, request, response, duration, recorder):
+        match = request.resolver_match
+        view = match.view_name if match else "<unresolved>"
+
+        if response.streaming:
+            size = None
+        else:
+            size = len(response.content)
+
+        registry.observe_request(
+            view,
+            request.method,
+            response.status_code,
+            duration,
+            recorder.count if recorder else None,
+            recorder.duration if recorder else None,
+            size,
+        )
+
+        if duration * 1000 < settings.SLOW_REQUEST_MS:
+            return
+
+        if recorder is None:
+            slow_request_logger.warning(
+                "Slow request %s %s (%s): %.1f ms",
+                request.method,
+                request.path,
+                view,
+                duration * 1000,
+            )
+            return
+
+        slow_request_logger.warning(
+            "Slow request %s %s (%s): %.1f ms, %d queries, %.1f ms in DB\n%s",
+            request.method,
+            request.path,
+            view,
+            duration * 1000,
+            recorder.count,
+            recorder.duration * 1000,
+            "\n".join(f"  {elapsed * 1000:.1f} ms: {sql}" for elapsed, sql in recorder.slowest),
+        )
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.6 on 2026-10-17 07:36
+
+import logging
+
+from django.db import migrations, models
+from django.db.models import Count
+
+logger = logging.getLogger("survey.migrations")
+
+ORDER_NUMBER_MAX_LENGTH = 64
+
+
+def rename_duplicate_order_numbers(apps, schema_editor):
+    """
+    До ограничения на одну пару (point, order_number) могло быть выдано
+    несколько опросов. Номер остается у одного: завершенного, если такой есть,
+    иначе у самого раннего. Остальным к номеру дописывается ~<id> — опросы,
+    ответы и выданные ссылки сохраняются, переименованные пишутся в лог.
+    """
+    Survey = apps.get_model("survey", "Survey")
+    db_alias = schema_editor.connection.alias
+    surveys = Survey.objects.using(db_alias)
+
+    duplicates = (
+        surveys.values("point_id", "order_number")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+        .values_list("point_id", "order_number")
+    )
+
+    for point_id, order_number in list(duplicates):
+        group = surveys.filter(point_id=point_id, order_number=order_number).order_by(
+            "-completed", "created_at", "id"
+        )
+        for survey in group[1:]:
+            suffix = f"~{survey.pk}"
+            survey.order_number = order_number[: ORDER_NUMBER_MAX_LENGTH - len(suffix)] + suffix
+            survey.save(update_fields=["order_number"])
+            logger.warning(
+                "Survey %s: duplicate order number %r on point %s renamed to %r",
+                survey.pk,
+                order_number,
+                point_id,
+                survey.order_number,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0004_ownerprofile'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_order_numbers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='survey',
+            constraint=models.UniqueConstraint(fields=('point', 'order_number'), name='survey_point_order_number_uniq'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-17 07:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0005_survey_point_order_number_uniq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('issued_count', models.PositiveIntegerField(default=0, verbose_name='Выдано опросов')),
+                ('completed_count', models.PositiveIntegerField(default=0, verbose_name='Завершено опросов')),
+                ('rated_count', models.PositiveIntegerField(default=0, verbose_name='Опросов с оценкой')),
+                ('rating_count', models.PositiveIntegerField(default=0, verbose_name='Кол-во оценок')),
+                ('rating_sum', models.PositiveBigIntegerField(default=0, verbose_name='Сумма оценок')),
+                ('point', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='survey.point', verbose_name='ПВЗ')),
+            ],
+            options={
+                'verbose_name': 'Статистика ПВЗ за день',
+                'verbose_name_plural': 'Статистика ПВЗ по дням',
+                'constraints': [models.UniqueConstraint(fields=('point', 'date'), name='pointdailystats_point_date_uniq')],
+            },
+        ),
+    ]
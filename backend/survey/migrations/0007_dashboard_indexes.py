@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-17 07:40
+
+from django.db import migrations, models
+
+from survey.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY не выполняется внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('survey', '0006_pointdailystats'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='answer',
+            index=models.Index(condition=models.Q(('answer_rating__isnull', False)), fields=['survey', 'answer_rating'], name='answer_survey_rating_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='survey',
+            index=models.Index(fields=['point', 'created_at', 'id'], name='survey_point_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='survey',
+            index=models.Index(condition=models.Q(('completed', True)), fields=['point', 'created_at'], name='survey_point_completed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='survey',
+            index=models.Index(fields=['created_at', 'id'], name='survey_created_idx'),
+        ),
+    ]
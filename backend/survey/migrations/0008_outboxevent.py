@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-17 07:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0007_dashboard_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('survey_completed', 'Опрос завершен')], max_length=64, verbose_name='Тип')),
+                ('payload', models.JSONField(default=dict, verbose_name='Данные')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('done', 'Выполнено'), ('failed', 'Ошибка')], default='pending', max_length=16, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Выполнить не раньше')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Выполнено в')),
+            ],
+            options={
+                'verbose_name': 'Событие outbox',
+                'verbose_name_plural': 'События outbox',
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['available_at', 'id'], name='outbox_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-17 08:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0008_outboxevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowRatingAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating', models.PositiveSmallIntegerField(verbose_name='Минимальная оценка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='low_rating_alerts', to=settings.AUTH_USER_MODEL, verbose_name='Владелец')),
+                ('point', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='low_rating_alerts', to='survey.point', verbose_name='ПВЗ')),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='low_rating_alerts', to='survey.survey', verbose_name='Опрос')),
+            ],
+            options={
+                'verbose_name': 'Уведомление о низкой оценке',
+                'verbose_name_plural': 'Уведомления о низких оценках',
+                'indexes': [models.Index(condition=models.Q(('sent_at__isnull', True)), fields=['owner', 'created_at'], name='lowratingalert_pending_idx')],
+                'constraints': [models.UniqueConstraint(fields=('owner', 'survey'), name='lowratingalert_owner_survey_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-17 08:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0009_lowratingalert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveySubmission',
+            fields=[
+                ('survey', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='submission', serialize=False, to='survey.survey', verbose_name='Опрос')),
+                ('idempotency_key', models.CharField(max_length=255, verbose_name='Idempotency-Key')),
+                ('response', models.JSONField(verbose_name='Ответ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Отправка опроса',
+                'verbose_name_plural': 'Отправки опросов',
+            },
+        ),
+    ]
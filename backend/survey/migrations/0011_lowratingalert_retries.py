@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-17 08:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0010_surveysubmission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lowratingalert',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Неудачных попыток'),
+        ),
+        migrations.AddField(
+            model_name='lowratingalert',
+            name='last_error',
+            field=models.TextField(blank=True, verbose_name='Последняя ошибка'),
+        ),
+        migrations.AddField(
+            model_name='lowratingalert',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Повтор не раньше'),
+        ),
+        migrations.AddField(
+            model_name='lowratingalert',
+            name='sent_backends',
+            field=models.JSONField(blank=True, default=list, verbose_name='Доставлено каналами'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-17 08:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from survey.migration_operations import AddIndexConcurrently
+
+
+def fill_event_survey(apps, schema_editor):
+    # Поиск по опросу нужен только необработанным событиям
+    OutboxEvent = apps.get_model('survey', 'OutboxEvent')
+    events = OutboxEvent.objects.using(schema_editor.connection.alias).exclude(status='done')
+    for event in events.filter(payload__has_key='survey_id').only('payload').iterator():
+        event.survey_id = event.payload['survey_id']
+        event.save(update_fields=['survey'])
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY не выполняется внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('survey', '0011_lowratingalert_retries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='survey',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='survey.survey', verbose_name='Опрос'),
+        ),
+        migrations.RunPython(fill_event_survey, migrations.RunPython.noop, atomic=True),
+        AddIndexConcurrently(
+            model_name='outboxevent',
+            index=models.Index(condition=models.Q(('status', 'done'), _negated=True), fields=['survey'], name='outbox_survey_open_idx'),
+        ),
+    ]
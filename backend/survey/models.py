@@ -3,9 +3,9 @@ import uuid
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.db.models import Avg
+from django.utils import timezone
 
 from django.contrib.auth.models import User
-from django.db import models
 
 
 class Point(models.Model):
@@ -55,6 +55,28 @@ class Question(models.Model):
         return f'[{self.category}] {self.text[:60]}'
 
 
+class SurveyQuerySet(models.QuerySet):
+
+    def with_average_rating(self):
+        """
+        Аннотирует avg_rating коррелированным подзапросом.
+
+        Подзапрос считается только для выбранных строк, поэтому дешев
+        для постраничных списков (changelist, дашборд).
+        """
+        return self.annotate(
+            avg_rating=models.Subquery(
+                Answer.objects.filter(
+                    survey=models.OuterRef("pk"),
+                    answer_rating__isnull=False,
+                )
+                .values("survey")
+                .annotate(avg=Avg("answer_rating"))
+                .values("avg")
+            )
+        )
+
+
 class Survey(models.Model):
     was_pickup = models.BooleanField("Было получение", default=False)
     was_tire_service = models.BooleanField("Был шиномонтаж", default=False)
@@ -71,9 +93,35 @@ class Survey(models.Model):
     created_at = models.DateTimeField("Создан", auto_now_add=True)
     completed_at = models.DateTimeField("Завершен в", blank=True, null=True)
 
+    objects = SurveyQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Опрос"
         verbose_name_plural = "Опросы"
+        indexes = [
+            # Дашборд владельца: point IN (...) + диапазон created_at + keyset (created_at, id)
+            models.Index(
+                fields=("point", "created_at", "id"),
+                name="survey_point_created_idx",
+            ),
+            # Завершенные опросы ПВЗ за период
+            models.Index(
+                fields=("point", "created_at"),
+                name="survey_point_completed_idx",
+                condition=models.Q(completed=True),
+            ),
+            # Changelist суперпользователя: ORDER BY created_at DESC
+            models.Index(
+                fields=("created_at", "id"),
+                name="survey_created_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=("point", "order_number"),
+                name="survey_point_order_number_uniq",
+            ),
+        ]
 
 
     def __str__(self) -> str:
@@ -81,6 +129,20 @@ class Survey(models.Model):
 
     @property
     def average_rating(self):
+        # Аннотация with_average_rating()
+        if "avg_rating" in self.__dict__:
+            return self.avg_rating
+
+        # prefetch_related("answers")
+        prefetched = getattr(self, "_prefetched_objects_cache", {})
+        if "answers" in prefetched:
+            ratings = [
+                answer.answer_rating
+                for answer in prefetched["answers"]
+                if answer.answer_rating is not None
+            ]
+            return sum(ratings) / len(ratings) if ratings else None
+
         result = self.answers.filter(
             answer_rating__isnull=False
         ).aggregate(avg=Avg("answer_rating"))
@@ -114,6 +176,14 @@ class Answer(models.Model):
         unique_together = ('survey', 'question')
         verbose_name = "Ответ"
         verbose_name_plural = "Ответы"
+        indexes = [
+            # Средний рейтинг опроса: index-only scan по оценкам
+            models.Index(
+                fields=("survey", "answer_rating"),
+                name="answer_survey_rating_idx",
+                condition=models.Q(answer_rating__isnull=False),
+            ),
+        ]
 
 
     def __str__(self) -> str:
@@ -127,6 +197,193 @@ class Answer(models.Model):
             return self.answer_yes_no
         return self.answer_text
 
+class SurveySubmission(models.Model):
+    """
+    Ответ на успешную отправку опроса с Idempotency-Key.
+
+    Повтор запроса с тем же ключом (сеть оборвалась после коммита,
+    двойное нажатие) получает этот же ответ вместо 409.
+    """
+
+    survey = models.OneToOneField(
+        Survey,
+        verbose_name="Опрос",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='submission'
+    )
+    idempotency_key = models.CharField("Idempotency-Key", max_length=255)
+    response = models.JSONField("Ответ")
+    created_at = models.DateTimeField("Создано", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Отправка опроса"
+        verbose_name_plural = "Отправки опросов"
+
+    def __str__(self) -> str:
+        return f'{self.survey_id} ({self.idempotency_key})'
+
+
+class PointDailyStats(models.Model):
+    """
+    Суточная сводка по ПВЗ для дашбордов.
+
+    День — дата создания опроса, как и в фильтрах дашбордов.
+    Пополняется инкрементально, пересобирается rebuild_point_daily_stats.
+    """
+
+    point = models.ForeignKey(
+        Point,
+        verbose_name="ПВЗ",
+        on_delete=models.CASCADE,
+        related_name='daily_stats'
+    )
+    date = models.DateField("Дата")
+    issued_count = models.PositiveIntegerField("Выдано опросов", default=0)
+    completed_count = models.PositiveIntegerField("Завершено опросов", default=0)
+    rated_count = models.PositiveIntegerField("Опросов с оценкой", default=0)
+    rating_count = models.PositiveIntegerField("Кол-во оценок", default=0)
+    rating_sum = models.PositiveBigIntegerField("Сумма оценок", default=0)
+
+    class Meta:
+        verbose_name = "Статистика ПВЗ за день"
+        verbose_name_plural = "Статистика ПВЗ по дням"
+        constraints = [
+            models.UniqueConstraint(
+                fields=("point", "date"),
+                name="pointdailystats_point_date_uniq",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.point_id} @ {self.date}'
+
+
+class OutboxEvent(models.Model):
+    """
+    Побочное действие после отправки опроса (transactional outbox).
+
+    Пишется в той же транзакции, что и ответы, выполняется воркером
+    process_outbox. Событие не теряется при падении процесса и не
+    появляется, если транзакция отправки откатилась.
+    """
+
+    class Kind(models.TextChoices):
+        SURVEY_COMPLETED = 'survey_completed', 'Опрос завершен'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Ожидает'
+        DONE = 'done', 'Выполнено'
+        FAILED = 'failed', 'Ошибка'
+
+    kind = models.CharField("Тип", max_length=64, choices=Kind.choices)
+    payload = models.JSONField("Данные", default=dict)
+    # Копия payload["survey_id"] для индексного поиска необработанных событий
+    # опроса (stats.completion_accounted). Без FK-ограничения: событие
+    # переживает удаление опроса, а удаление не трогает outbox
+    survey = models.ForeignKey(
+        Survey,
+        verbose_name="Опрос",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+',
+        blank=True,
+        null=True,
+    )
+    status = models.CharField(
+        "Статус",
+        max_length=16,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField("Попыток", default=0)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+    created_at = models.DateTimeField("Создано", auto_now_add=True)
+    available_at = models.DateTimeField("Выполнить не раньше", default=timezone.now)
+    processed_at = models.DateTimeField("Выполнено в", blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Событие outbox"
+        verbose_name_plural = "События outbox"
+        indexes = [
+            # Выборка воркера: только ожидающие, по времени готовности
+            models.Index(
+                fields=("available_at", "id"),
+                name="outbox_pending_idx",
+                condition=models.Q(status='pending'),
+            ),
+            # Необработанные события опроса: правки опросов и ответов
+            models.Index(
+                fields=("survey",),
+                name="outbox_survey_open_idx",
+                condition=~models.Q(status='done'),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.kind} #{self.pk} ({self.status})'
+
+
+class LowRatingAlert(models.Model):
+    """
+    Низкая оценка для владельца ПВЗ, ожидающая отправки в дайджесте.
+
+    Строка на пару (владелец, опрос); sent_at выставляется, когда
+    дайджест с ней доставлен всеми каналами ALERT_BACKENDS. Каналы,
+    уже доставившие уведомление, записаны в sent_backends и при
+    повторе его не шлют.
+    """
+
+    owner = models.ForeignKey(
+        User,
+        verbose_name="Владелец",
+        on_delete=models.CASCADE,
+        related_name='low_rating_alerts'
+    )
+    survey = models.ForeignKey(
+        Survey,
+        verbose_name="Опрос",
+        on_delete=models.CASCADE,
+        related_name='low_rating_alerts'
+    )
+    point = models.ForeignKey(
+        Point,
+        verbose_name="ПВЗ",
+        on_delete=models.CASCADE,
+        related_name='low_rating_alerts'
+    )
+    rating = models.PositiveSmallIntegerField("Минимальная оценка")
+    created_at = models.DateTimeField("Создано", auto_now_add=True)
+    sent_at = models.DateTimeField("Отправлено", blank=True, null=True)
+    sent_backends = models.JSONField("Доставлено каналами", default=list, blank=True)
+    attempts = models.PositiveSmallIntegerField("Неудачных попыток", default=0)
+    next_attempt_at = models.DateTimeField("Повтор не раньше", blank=True, null=True)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+
+    class Meta:
+        verbose_name = "Уведомление о низкой оценке"
+        verbose_name_plural = "Уведомления о низких оценках"
+        constraints = [
+            # Повтор события outbox не плодит дубликаты
+            models.UniqueConstraint(
+                fields=("owner", "survey"),
+                name="lowratingalert_owner_survey_uniq",
+            ),
+        ]
+        indexes = [
+            # Неотправленные уведомления владельца
+            models.Index(
+                fields=("owner", "created_at"),
+                name="lowratingalert_pending_idx",
+                condition=models.Q(sent_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.owner_id}: {self.survey_id} ({self.rating})'
+
+
 class OwnerProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     points = models.ManyToManyField("Point", verbose_name="Доступные ПВЗ")
@@ -0,0 +1,99 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from .metrics import registry
+from .models import OutboxEvent
+
+logger = logging.getLogger("survey.outbox")
+
+HANDLERS = {}
+
+# Пауза перед повтором растет как 2**attempts секунд, но не больше часа
+MAX_RETRY_DELAY = 3600
+
+
+def handler(kind):
+    """
+    Регистрирует обработчик события: handler(payload).
+
+    Доставка — как минимум один раз: обработчик должен переживать повтор.
+    """
+
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+
+    return register
+
+
+def enqueue(kind, **payload):
+    """
+    Ставит событие в очередь. Вызывается внутри транзакции вместе с изменениями,
+    которые его породили. survey_id из payload дублируется в поле survey.
+    """
+    return OutboxEvent.objects.using(DEFAULT_DB_ALIAS).create(
+        kind=kind,
+        survey_id=payload.get("survey_id"),
+        payload=payload,
+    )
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=min(2**attempts, MAX_RETRY_DELAY))
+
+
+def process_batch(batch_size=100, max_attempts=10):
+    """
+    Выполняет пачку готовых событий. Возвращает число обработанных.
+
+    Пачка блокируется с SKIP LOCKED, поэтому воркеров можно запускать
+    несколько. Каждый обработчик — в своем savepoint: ошибка одного
+    события откатывает только его изменения.
+    """
+    now = timezone.now()
+
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        events = list(
+            OutboxEvent.objects.using(DEFAULT_DB_ALIAS)
+            .select_for_update(skip_locked=True)
+            .filter(status=OutboxEvent.Status.PENDING, available_at__lte=now)
+            .order_by("available_at", "id")[:batch_size]
+        )
+
+        for event in events:
+            event.attempts += 1
+            try:
+                with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                    HANDLERS[event.kind](event.payload)
+            except Exception:
+                event.last_error = traceback.format_exc()
+                if event.attempts >= max_attempts:
+                    event.status = OutboxEvent.Status.FAILED
+                    logger.exception("Outbox event %s failed permanently", event.pk)
+                else:
+                    event.available_at = timezone.now() + _retry_delay(event.attempts)
+                    logger.warning("Outbox event %s failed, retry #%s", event.pk, event.attempts)
+            else:
+                event.status = OutboxEvent.Status.DONE
+                event.processed_at = timezone.now()
+
+            registry.inc("survey_outbox_events_total", (("kind", event.kind), ("status", event.status)))
+
+        OutboxEvent.objects.using(DEFAULT_DB_ALIAS).bulk_update(
+            events,
+            ["status", "attempts", "last_error", "available_at", "processed_at"],
+        )
+
+    return len(events)
+
+
+def purge_processed(older_than):
+    deleted, _ = OutboxEvent.objects.filter(
+        status=OutboxEvent.Status.DONE,
+        processed_at__lt=timezone.now() - older_than,
+    ).delete()
+    return deleted
@@ -0,0 +1,77 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .cache import get_version
+from .models import OwnerProfile
+
+OWNERSHIP_VERSION = "ownership"
+
+
+def point_owners_index():
+    """
+    {point_id: [user_id, ...]} по OwnerProfile.points, одним запросом.
+
+    Хранится в общем кэше под версией OWNERSHIP_VERSION; версия
+    поднимается сигналами при изменении прав владельцев. Срок жизни
+    конечный: ключи прошлых версий иначе копились бы в Redis вечно.
+    """
+    key = f"survey:point_owners:{get_version(OWNERSHIP_VERSION)}"
+    index = cache.get(key)
+    if index is None:
+        index = defaultdict(list)
+        # С primary: с отставшей реплики старые права закэшировались бы под новой версией
+        rows = OwnerProfile.points.through.objects.using(DEFAULT_DB_ALIAS).values_list(
+            "point_id", "ownerprofile__user_id"
+        )
+        for point_id, user_id in rows:
+            index[point_id].append(user_id)
+        index = dict(index)
+        cache.set(key, index, timeout=settings.OWNERSHIP_CACHE_TIMEOUT)
+    return index
+
+
+def point_owner_ids(point_id):
+    return point_owners_index().get(point_id, [])
+
+
+def owner_point_ids(user):
+    """
+    ID доступных владельцу ПВЗ (frozenset) или None, если user не владелец.
+
+    Запоминается на объекте пользователя (один расчет на запрос) и в общем
+    кэше под версией OWNERSHIP_VERSION (между запросами). Весь скоупинг
+    владельца идет через этот набор: filter(point_id__in=ids).
+    """
+    if not user.is_authenticated:
+        return None
+
+    try:
+        return user._owner_point_ids
+    except AttributeError:
+        pass
+
+    key = f"survey:owner_points:{get_version(OWNERSHIP_VERSION)}:{user.pk}"
+    cached = cache.get(key)
+    if cached is None:
+        profile_id = OwnerProfile.objects.using(DEFAULT_DB_ALIAS).filter(user=user).values_list("id", flat=True).first()
+        point_ids = None
+        if profile_id is not None:
+            point_ids = list(
+                OwnerProfile.points.through.objects.using(DEFAULT_DB_ALIAS)
+                .filter(ownerprofile_id=profile_id)
+                .values_list("point_id", flat=True)
+            )
+        # None в кэше неотличим от промаха, поэтому храним пару
+        cached = (profile_id is not None, point_ids)
+        cache.set(key, cached, timeout=settings.OWNERSHIP_CACHE_TIMEOUT)
+
+    is_owner, point_ids = cached
+    user._owner_point_ids = frozenset(point_ids) if is_owner else None
+    return user._owner_point_ids
+
+
+def is_owner(user):
+    return owner_point_ids(user) is not None
@@ -0,0 +1,52 @@
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(survey):
+    raw = f"{survey.created_at.isoformat()}|{survey.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, pk = raw.rsplit("|", 1)
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+    if created_at is None:
+        raise InvalidCursor(cursor)
+
+    return created_at, pk
+
+
+def keyset_page(surveys, cursor=None, page_size=50):
+    """
+    Страница опросов от новых к старым по ключу (created_at, id).
+
+    В отличие от OFFSET стоимость страницы не зависит от глубины прокрутки.
+    Возвращает (опросы, курсор следующей страницы или None).
+    """
+    surveys = surveys.order_by("-created_at", "-id")
+
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        surveys = surveys.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+
+    page = list(surveys[:page_size + 1])
+    if len(page) <= page_size:
+        return page, None
+
+    page = page[:page_size]
+    return page, encode_cursor(page[-1])
@@ -0,0 +1,120 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = "replica"
+STICKY_SESSION_KEY = "_replica_sticky_until"
+
+# Включается только на время аналитических вьюх (дашборды, выгрузка, просмотр опроса)
+_replica_reads = ContextVar("survey_replica_reads", default=False)
+# Флаг записи в рамках текущего запроса; выставляет роутер, читает middleware
+_writes = ContextVar("survey_replica_writes", default=None)
+
+# Служебные таблицы (сессии, DatabaseCache): запись в них — не действие
+# пользователя, и читать после нее с primary незачем
+STICKY_IGNORED_APPS = frozenset({"sessions", "django_cache"})
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+class ReplicaRouter:
+    """
+    Чтения внутри read_from_replica уходят на реплику, всё остальное — на primary.
+
+    Внутри transaction.atomic на primary читаем с primary: транзакция должна
+    видеть свои же изменения, а submit вообще не помечен для реплики.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return REPLICA_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        writes = _writes.get()
+        if writes is not None and model._meta.app_label not in STICKY_IGNORED_APPS:
+            writes.append(model)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия primary, объекты с обеих баз совместимы
+        databases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему на реплику приносит репликация
+        if db == REPLICA_DB_ALIAS:
+            return False
+        return None
+
+
+def is_sticky(request):
+    session = getattr(request, "session", None)
+    return session is not None and session.get(STICKY_SESSION_KEY, 0) > time.time()
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    token = _replica_reads.set(enabled and replica_configured())
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def iter_replica_reads(iterable, enabled=True):
+    """
+    Для StreamingHttpResponse: итерация идет уже после выхода из вьюхи,
+    поэтому реплику включаем на каждый шаг генератора.
+    """
+    iterator = iter(iterable)
+    while True:
+        with replica_reads(enabled):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def read_from_replica(view):
+    """
+    Аналитическая вьюха: чтения — с реплики, если сессия не в окне после записи.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads(not is_sticky(request)):
+            response = view(request, *args, **kwargs)
+            # TemplateResponse (админка) рендерится позже — делаем это здесь,
+            # пока роутинг на реплику еще действует
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+        return response
+
+    return wrapper
+
+
+def mark_writes():
+    """
+    Начало отслеживания записей в запросе; токен передается в finish_writes.
+    """
+    return _writes.set([])
+
+
+def finish_writes(request, token):
+    writes = _writes.get()
+    _writes.reset(token)
+
+    # Только для уже существующих сессий: публичному API сессии не создаем
+    session = getattr(request, "session", None)
+    if writes and session is not None and session.session_key:
+        session[STICKY_SESSION_KEY] = time.time() + settings.REPLICA_STICKY_SECONDS
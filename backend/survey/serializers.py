@@ -1,6 +1,11 @@
+import json
+
+from django.conf import settings
+from django.db import connections, transaction
 from rest_framework import serializers
 
-from .models import Answer, Question, Survey
+from .models import Answer, Point, Question, Survey
+from .stats import record_surveys_issued
 
 
 class QuestionSerializer(serializers.ModelSerializer):
@@ -33,14 +38,71 @@ class SurveyPublicSerializer(serializers.ModelSerializer):
         return QuestionSerializer(self.context["questions"], many=True).data
 
     def get_service_type(self, obj):
-        # Совместимость со старым фронтом
-        if obj.was_pickup and obj.was_tire_service:
-            return "both"
-        if obj.was_pickup:
-            return "pickup"
-        if obj.was_tire_service:
-            return "tire_service"
+        return get_service_type(obj)
+
+
+def get_service_type(survey):
+    # Совместимость со старым фронтом
+    if survey.was_pickup and survey.was_tire_service:
         return "both"
+    if survey.was_pickup:
+        return "pickup"
+    if survey.was_tire_service:
+        return "tire_service"
+    return "both"
+
+
+# =====================================================
+# БЫСТРЫЙ РЕНДЕР ПУБЛИЧНОГО ОПРОСА
+# =====================================================
+
+# Те же параметры, что у DRF JSONRenderer (compact, UNICODE_JSON, STRICT_JSON):
+# ответ байт-в-байт совпадает с SurveyPublicSerializer + JSONRenderer
+_encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def encode_json(value):
+    return _encoder.encode(value).replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+
+def encode_questions(questions):
+    """
+    JSON-фрагмент списка вопросов — один на набор вопросов, кэшируется.
+    """
+    return encode_json(
+        [
+            {
+                "id": q.id,
+                "text": q.text,
+                "category": q.category,
+                "type": q.type,
+                "is_required": q.is_required,
+                "order": q.order,
+            }
+            for q in questions
+        ]
+    )
+
+
+def render_survey_public(survey, questions_json):
+    """
+    Ответ PublicSurveyDetailView без DRF-сериализаторов: маленький конверт
+    опроса + готовый фрагмент вопросов. Формат — SurveyData во фронте.
+    """
+    envelope = encode_json(
+        {
+            "token": str(survey.token),
+            "order_number": survey.order_number,
+            "service_type": get_service_type(survey),
+            "completed": survey.completed,
+            "point": {
+                "id": survey.point.id,
+                "name": survey.point.name,
+                "city": survey.point.city,
+            },
+        }
+    )
+    return f'{envelope[:-1]},"questions":{questions_json}}}'.encode()
 
 
 class SubmitAnswerItemSerializer(serializers.Serializer):
@@ -111,16 +173,122 @@ class SubmitSurveySerializer(serializers.Serializer):
         survey: Survey = self.validated_data["survey"]
         payload = self.validated_data["validated_answers"]
 
-        # Лучше update_or_create: не сломается при повторной отправке/дублях
-        for item in payload:
-            Answer.objects.update_or_create(
+        answers = [
+            Answer(
                 survey=survey,
                 question=item["question"],
-                defaults={
-                    "answer_rating": item["rating"],
-                    "answer_yes_no": item["yes_no"],
-                    "answer_text": item["text"],
-                },
+                answer_rating=item["rating"],
+                answer_yes_no=item["yes_no"],
+                answer_text=item["text"],
+            )
+            for item in payload
+        ]
+        fields = ["answer_rating", "answer_yes_no", "answer_text"]
+
+        if not connections[Answer.objects.db].features.supports_update_conflicts_with_target:
+            # Бэкенд без ON CONFLICT (...) DO UPDATE: уже записанные ответы
+            # обновляются отдельно. Тоже bulk-операции — без сигналов на каждую
+            # строку, как и у upsert ниже
+            existing = dict(
+                Answer.objects.filter(survey=survey, question__in=[answer.question for answer in answers])
+                .values_list("question_id", "pk")
             )
+            for answer in answers:
+                answer.pk = existing.get(answer.question_id)
+            updated = [answer for answer in answers if answer.pk is not None]
+            Answer.objects.bulk_create([answer for answer in answers if answer.pk is None])
+            Answer.objects.bulk_update(updated, fields)
+            return survey
+
+        # Один INSERT ... ON CONFLICT: не сломается при повторной отправке/дублях
+        Answer.objects.bulk_create(
+            answers,
+            update_conflicts=True,
+            unique_fields=["survey", "question"],
+            update_fields=fields,
+        )
 
         return survey
+
+
+class BulkSurveyItemSerializer(serializers.Serializer):
+    order_number = serializers.CharField(max_length=64)
+    point = serializers.IntegerField()
+    was_pickup = serializers.BooleanField(default=False)
+    was_tire_service = serializers.BooleanField(default=False)
+
+
+class BulkSurveyIssueSerializer(serializers.Serializer):
+    orders = BulkSurveyItemSerializer(many=True, allow_empty=False)
+
+    def validate_orders(self, orders):
+        max_items = settings.SURVEY_BULK_MAX_ITEMS
+        if len(orders) > max_items:
+            raise serializers.ValidationError(f"Too many orders in one request (max {max_items}).")
+
+        # Все ПВЗ проверяем одним запросом
+        point_ids = {item["point"] for item in orders}
+        known = set(
+            Point.objects.filter(id__in=point_ids, is_active=True).values_list("id", flat=True)
+        )
+        unknown = sorted(point_ids - known)
+        if unknown:
+            raise serializers.ValidationError(f"Unknown or inactive points: {unknown}.")
+
+        return orders
+
+    @transaction.atomic
+    def save(self, **kwargs):
+        orders = self.validated_data["orders"]
+        chunk_size = settings.SURVEY_BULK_CHUNK_SIZE
+
+        # Повтор (point, order_number) внутри запроса получает тот же токен
+        unique = {}
+        for item in orders:
+            unique.setdefault((item["point"], item["order_number"]), item)
+        keys = list(unique)
+
+        issued = {}
+        created_surveys = []
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            candidates = [
+                Survey(
+                    point_id=point_id,
+                    order_number=order_number,
+                    was_pickup=unique[point_id, order_number]["was_pickup"],
+                    was_tire_service=unique[point_id, order_number]["was_tire_service"],
+                )
+                for point_id, order_number in chunk
+            ]
+            # Уже выданные опросы не трогаем: ретрай вернёт прежние токены
+            Survey.objects.bulk_create(candidates, ignore_conflicts=True)
+
+            new_tokens = {(s.point_id, s.order_number): s.token for s in candidates}
+            rows = Survey.objects.filter(
+                point_id__in={point_id for point_id, _ in chunk},
+                order_number__in={order_number for _, order_number in chunk},
+            ).values_list("point_id", "order_number", "token")
+            for point_id, order_number, token in rows:
+                key = (point_id, order_number)
+                if key in new_tokens:
+                    issued[key] = (token, token == new_tokens[key])
+
+            created_surveys.extend(
+                s for s in candidates if issued[s.point_id, s.order_number][1]
+            )
+
+        record_surveys_issued(created_surveys)
+
+        result = []
+        for item in orders:
+            token, created = issued[item["point"], item["order_number"]]
+            result.append(
+                {
+                    "order_number": item["order_number"],
+                    "point": item["point"],
+                    "token": token,
+                    "created": created,
+                }
+            )
+        return result
@@ -0,0 +1,152 @@
+from collections import Counter, defaultdict
+from weakref import WeakKeyDictionary
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import QUESTIONS_VERSION, bump_version, questions_cache
+from .models import Answer, OwnerProfile, Question, Survey
+from .ownership import OWNERSHIP_VERSION
+from .stats import (
+    completion_accounted,
+    record_survey_changed,
+    record_surveys_issued,
+    survey_contribution,
+    survey_ratings,
+)
+
+
+def _bump_questions_version():
+    bump_version(QUESTIONS_VERSION)
+    questions_cache.invalidate()
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, **kwargs):
+    # После коммита: иначе другой воркер может закэшировать старые данные под новой версией
+    transaction.on_commit(_bump_questions_version)
+
+
+@receiver(post_save, sender=Survey)
+def survey_created(sender, instance, created, raw=False, **kwargs):
+    # bulk_create сигналов не шлет — массовая выдача учитывает опросы сама
+    if created and not raw:
+        record_surveys_issued([instance])
+
+
+# =====================================================
+# СВОДКА ПРИ ПРАВКАХ (админка, код)
+# QuerySet.update и bulk-операции сигналов не шлют —
+# после них нужен rebuild_point_daily_stats
+# =====================================================
+
+@receiver(pre_save, sender=Survey)
+def survey_before_save(sender, instance, raw=False, **kwargs):
+    instance._stats_before = None
+    if not raw and instance.pk is not None:
+        instance._stats_before = (
+            Survey.objects.filter(pk=instance.pk).only("point_id", "created_at", "completed").first()
+        )
+
+
+@receiver(post_save, sender=Survey)
+def survey_changed(sender, instance, created, raw=False, **kwargs):
+    before = getattr(instance, "_stats_before", None)
+    if created or raw or before is None:
+        return
+    if (before.point_id, before.completed) == (instance.point_id, instance.completed):
+        return
+
+    with transaction.atomic():
+        accounted = completion_accounted(instance.pk)
+        ratings = survey_ratings(instance.pk) if accounted else []
+        record_survey_changed(
+            survey_contribution(before, ratings, accounted),
+            survey_contribution(instance, ratings, accounted),
+        )
+
+
+@receiver(pre_delete, sender=Survey)
+def survey_deleted(sender, instance, **kwargs):
+    # pre_delete шлется в транзакции удаления, пока ответы еще в БД;
+    # состояние берем оттуда же, а не из возможно устаревшего instance
+    survey = Survey.objects.only("point_id", "created_at", "completed").get(pk=instance.pk)
+    accounted = completion_accounted(survey.pk)
+    ratings = survey_ratings(survey.pk) if accounted else []
+    record_survey_changed(before=survey_contribution(survey, ratings, accounted))
+
+
+@receiver(pre_save, sender=Answer)
+def answer_before_save(sender, instance, raw=False, **kwargs):
+    instance._stats_rating = None
+    if not raw and instance.pk is not None:
+        instance._stats_rating = (
+            Answer.objects.filter(pk=instance.pk).values_list("answer_rating", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Answer)
+def answer_changed(sender, instance, raw=False, **kwargs):
+    old = getattr(instance, "_stats_rating", None)
+    new = instance.answer_rating
+    if raw or old == new:
+        return
+
+    with transaction.atomic():
+        survey = Survey.objects.only("point_id", "created_at", "completed").get(pk=instance.survey_id)
+        if not completion_accounted(survey.pk):
+            return
+
+        after = Counter(survey_ratings(survey.pk))
+        before = after - Counter([new] if new is not None else []) + Counter([old] if old is not None else [])
+        record_survey_changed(
+            survey_contribution(survey, list(before.elements())),
+            survey_contribution(survey, list(after.elements())),
+        )
+
+
+# Оценки, уже снятые в текущем delete(): при удалении нескольких ответов
+# одного опроса каждый pre_delete видит в БД их все
+_removed_ratings = WeakKeyDictionary()
+
+
+@receiver(pre_delete, sender=Answer)
+def answer_deleted(sender, instance, origin=None, **kwargs):
+    if instance.answer_rating is None:
+        return
+    # Каскад от опроса или ПВЗ учитывается обработчиком опроса
+    if not (isinstance(origin, Answer) or (isinstance(origin, QuerySet) and origin.model is Answer)):
+        return
+
+    survey = Survey.objects.only("point_id", "created_at", "completed").get(pk=instance.survey_id)
+    if not completion_accounted(survey.pk):
+        return
+
+    removed = _removed_ratings.setdefault(origin, defaultdict(Counter))[survey.pk]
+    before = Counter(survey_ratings(survey.pk)) - removed
+    removed[instance.answer_rating] += 1
+    after = before - Counter([instance.answer_rating])
+    record_survey_changed(
+        survey_contribution(survey, list(before.elements())),
+        survey_contribution(survey, list(after.elements())),
+    )
+
+
+def _bump_ownership_version():
+    bump_version(OWNERSHIP_VERSION)
+
+
+@receiver(m2m_changed, sender=OwnerProfile.points.through)
+def owner_points_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(_bump_ownership_version)
+
+
+@receiver(post_save, sender=OwnerProfile)
+@receiver(post_delete, sender=OwnerProfile)
+def owner_profile_changed(sender, **kwargs):
+    # Пользователь стал или перестал быть владельцем
+    transaction.on_commit(_bump_ownership_version)
@@ -0,0 +1,345 @@
+from collections import Counter, defaultdict
+from functools import partial
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, FloatField, Q, Sum
+from django.db.models.functions import Cast, Coalesce, Greatest, Trunc, TruncDate
+from django.utils import timezone
+
+from .cache import STATS_VERSION, bump_version, get_or_set_versioned
+from .dates import as_date, datetime_range
+from .models import Answer, OutboxEvent, Point, PointDailyStats, Survey
+from .routers import replica_reads
+
+ROLLUP_FIELDS = ("issued_count", "completed_count", "rated_count", "rating_count", "rating_sum")
+
+
+# =====================================================
+# ИНКРЕМЕНТАЛЬНОЕ ОБНОВЛЕНИЕ
+# =====================================================
+
+def point_stats_version(point_id):
+    return f"{STATS_VERSION}:{point_id}"
+
+
+def _stats_changed(point_id=None):
+    """
+    Сбрасывает после коммита кэши, построенные по данным ПВЗ point_id,
+    или все (point_id=None, пересборка).
+    """
+    name = STATS_VERSION if point_id is None else point_stats_version(point_id)
+    transaction.on_commit(partial(bump_version, name))
+
+
+def get_or_set_stats(point_ids, key, loader, timeout):
+    """
+    Кэш дашбордной статистики по набору ПВЗ (тренды, вопросы).
+
+    Ключ привязан к общей версии STATS_VERSION (пересборка) и к версиям
+    ПВЗ из point_ids: прохождение опроса сбрасывает только кэши владельцев
+    его ПВЗ, а не всех. Одинаковые наборы ПВЗ делят одно значение.
+
+    point_ids=None (все ПВЗ, суперпользователь) меняется с каждым
+    прохождением в системе, поэтому держится только timeout.
+    """
+    names = [STATS_VERSION]
+    if point_ids is None:
+        scope = "all"
+    else:
+        scope = "points"
+        names += [point_stats_version(point_id) for point_id in sorted(point_ids)]
+
+    def load():
+        # Значение ляжет под уже новую версию — читаем с primary: отставшая
+        # реплика закэшировала бы данные до сбросившего версию коммита
+        with replica_reads(enabled=False):
+            return loader()
+
+    return get_or_set_versioned(names, f"{scope}:{key}", load, timeout=timeout)
+
+
+def _increment(point_id, day, **deltas):
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not deltas:
+        return
+
+    qs = PointDailyStats.objects.filter(point_id=point_id, date=day)
+    # Уменьшения не уходят ниже нуля: уже разошедшаяся сводка не ломает
+    # удаление опроса, а чинится rebuild_point_daily_stats
+    updates = {
+        field: F(field) + value if value > 0 else Greatest(F(field) + value, 0)
+        for field, value in deltas.items()
+    }
+
+    if qs.update(**updates):
+        return
+
+    created = {field: value for field, value in deltas.items() if value > 0}
+    if not created:
+        return
+
+    try:
+        with transaction.atomic():
+            PointDailyStats.objects.create(point_id=point_id, date=day, **created)
+    except IntegrityError:
+        # Строку за этот день только что создал параллельный запрос
+        qs.update(**updates)
+
+
+def record_surveys_issued(surveys):
+    per_day = Counter(
+        (survey.point_id, timezone.localdate(survey.created_at)) for survey in surveys
+    )
+    for (point_id, day), issued in per_day.items():
+        _increment(point_id, day, issued_count=issued)
+
+
+def record_survey_completed(survey, ratings):
+    # Кэши трендов сбрасываются на прохождение, но не на выдачу: при массовой
+    # рассылке они сбрасывались бы непрерывно. Выданные доходят по TREND_CACHE_TIMEOUT.
+    _stats_changed(survey.point_id)
+    _increment(
+        survey.point_id,
+        timezone.localdate(survey.created_at),
+        completed_count=1 if survey.completed else 0,
+        rated_count=1 if ratings else 0,
+        rating_count=len(ratings),
+        rating_sum=sum(ratings),
+    )
+
+
+# =====================================================
+# ПРАВКИ ОПРОСОВ И ОТВЕТОВ
+# =====================================================
+
+def survey_ratings(survey_id):
+    return list(
+        Answer.objects.filter(survey_id=survey_id, answer_rating__isnull=False)
+        .values_list("answer_rating", flat=True)
+    )
+
+
+def completion_accounted(survey_id):
+    """
+    Учтено ли прохождение опроса в сводке: событие SURVEY_COMPLETED
+    обработано (или его не было).
+
+    Необработанное событие блокируется: правка дождется воркера, который
+    обрабатывает его прямо сейчас, а воркер после правки прочитает уже
+    новое состояние опроса. Вызывается внутри транзакции.
+    """
+    pending = (
+        OutboxEvent.objects.select_for_update()
+        .filter(kind=OutboxEvent.Kind.SURVEY_COMPLETED, survey_id=survey_id)
+        .exclude(status=OutboxEvent.Status.DONE)
+        .values_list("pk", flat=True)
+    )
+    return not list(pending)
+
+
+def survey_contribution(survey, ratings, accounted=True):
+    """
+    Вклад опроса в сводку, как его считает rebuild_point_daily_stats:
+    ((ПВЗ, день), {поле: значение}).
+
+    Без accounted в вклад входит только выдача: прохождение добавит
+    обработчик события по состоянию опроса на момент обработки.
+    """
+    values = {"issued_count": 1}
+    if accounted:
+        values.update(
+            completed_count=1 if survey.completed else 0,
+            rated_count=1 if ratings else 0,
+            rating_count=len(ratings),
+            rating_sum=sum(ratings),
+        )
+    return (survey.point_id, timezone.localdate(survey.created_at)), values
+
+
+def record_survey_changed(before=None, after=None):
+    """
+    Применяет к сводке разницу вклада опроса до и после правки
+    (результаты survey_contribution; None — опроса нет).
+    """
+    deltas = defaultdict(Counter)
+    for contribution, sign in ((before, -1), (after, 1)):
+        if contribution is None:
+            continue
+        cell, values = contribution
+        for field, value in values.items():
+            deltas[cell][field] += sign * value
+
+    for (point_id, day), values in deltas.items():
+        if any(values.values()):
+            _stats_changed(point_id)
+            _increment(point_id, day, **values)
+
+
+# =====================================================
+# ПОЛНАЯ ПЕРЕСБОРКА
+# =====================================================
+
+@transaction.atomic
+def rebuild_point_daily_stats(date_from=None, date_to=None):
+    """
+    Пересчитывает сводку из Survey/Answer за период (по умолчанию — за всё время).
+    """
+    surveys = Survey.objects.filter(**datetime_range("created_at", date_from, date_to))
+
+    rows = {}
+
+    survey_counts = (
+        surveys.annotate(day=TruncDate("created_at"))
+        .values("point_id", "day")
+        .annotate(
+            issued_count=Count("id"),
+            completed_count=Count("id", filter=Q(completed=True)),
+        )
+    )
+    for row in survey_counts:
+        rows[row["point_id"], row["day"]] = PointDailyStats(
+            point_id=row["point_id"],
+            date=row["day"],
+            issued_count=row["issued_count"],
+            completed_count=row["completed_count"],
+        )
+
+    rating_counts = (
+        Answer.objects.filter(survey__in=surveys, answer_rating__isnull=False)
+        .annotate(day=TruncDate("survey__created_at"))
+        .values("survey__point_id", "day")
+        .annotate(
+            rated_count=Count("survey", distinct=True),
+            rating_count=Count("id"),
+            rating_sum=Sum("answer_rating"),
+        )
+    )
+    for row in rating_counts:
+        stats = rows[row["survey__point_id"], row["day"]]
+        stats.rated_count = row["rated_count"]
+        stats.rating_count = row["rating_count"]
+        stats.rating_sum = row["rating_sum"]
+
+    existing = PointDailyStats.objects.all()
+    if date_from:
+        existing = existing.filter(date__gte=date_from)
+    if date_to:
+        existing = existing.filter(date__lte=date_to)
+    existing.delete()
+
+    PointDailyStats.objects.bulk_create(rows.values(), batch_size=1000)
+    _stats_changed()
+    return len(rows)
+
+
+# =====================================================
+# ЧТЕНИЕ ДЛЯ ДАШБОРДОВ
+# =====================================================
+
+def get_daily_stats(point_ids=None, date_from=None, date_to=None):
+    """
+    Сводка за период. point_ids=None — все ПВЗ (суперпользователь).
+    Неразбираемые даты игнорируются, как и в datetime_range.
+    """
+    qs = PointDailyStats.objects.all()
+    if point_ids is not None:
+        qs = qs.filter(point_id__in=point_ids)
+
+    date_from = as_date(date_from) if date_from else None
+    if date_from is not None:
+        qs = qs.filter(date__gte=date_from)
+
+    date_to = as_date(date_to) if date_to else None
+    if date_to is not None:
+        qs = qs.filter(date__lte=date_to)
+    return qs
+
+
+def summarize_daily_stats(qs):
+    totals = qs.aggregate(
+        **{field: Coalesce(Sum(field), 0) for field in ROLLUP_FIELDS}
+    )
+    rating_count = totals["rating_count"]
+    totals["avg_rating"] = totals["rating_sum"] / rating_count if rating_count else None
+    return totals
+
+
+def point_daily_stats(qs):
+    return (
+        qs.values("point__id", "point__city", "point__name")
+        .annotate(
+            total_reviews=Sum("rating_count"),
+            total_orders_with_rating=Sum("rated_count"),
+            rating_total=Sum("rating_sum"),
+        )
+        .filter(total_reviews__gt=0)
+        .annotate(avg_rating=Cast("rating_total", FloatField()) / F("total_reviews"))
+        .order_by("-avg_rating")
+    )
+
+
+TREND_BUCKETS = ("day", "week", "month")
+
+
+def trend_stats(point_ids=None, date_from=None, date_to=None, bucket="day"):
+    """
+    Динамика по ПВЗ: средняя оценка, число оценок и доля прохождения
+    на интервал (день, неделя, месяц) — одним сгруппированным запросом по сводке.
+
+    Ответ колоночный: справочники buckets/points и параллельные массивы
+    rows, где point и bucket — индексы в справочниках. Пустые пары
+    (ПВЗ, интервал) не передаются.
+    """
+    qs = get_daily_stats(point_ids, date_from, date_to)
+
+    rows = (
+        qs.annotate(bucket=Trunc("date", bucket, output_field=DateField()))
+        .values("point_id", "bucket")
+        .annotate(
+            issued=Sum("issued_count"),
+            completed=Sum("completed_count"),
+            rating_count=Sum("rating_count"),
+            rating_sum=Sum("rating_sum"),
+        )
+        .order_by("bucket", "point_id")
+    )
+
+    buckets = {}
+    points = {}
+    columns = {
+        "point": [],
+        "bucket": [],
+        "avg_rating": [],
+        "rating_count": [],
+        "completion_rate": [],
+    }
+
+    for row in rows:
+        bucket_index = buckets.setdefault(row["bucket"], len(buckets))
+        point_index = points.setdefault(row["point_id"], len(points))
+
+        columns["point"].append(point_index)
+        columns["bucket"].append(bucket_index)
+        columns["rating_count"].append(row["rating_count"])
+        columns["avg_rating"].append(
+            round(row["rating_sum"] / row["rating_count"], 2) if row["rating_count"] else None
+        )
+        columns["completion_rate"].append(
+            round(row["completed"] / row["issued"], 3) if row["issued"] else None
+        )
+
+    names = {
+        point["id"]: point
+        for point in Point.objects.filter(pk__in=points).values("id", "city", "name")
+    }
+
+    return {
+        "bucket": bucket,
+        "buckets": [value.isoformat() for value in buckets],
+        "points": {
+            "id": list(points),
+            "city": [names[point_id]["city"] for point_id in points],
+            "name": [names[point_id]["name"] for point_id in points],
+        },
+        "rows": columns,
+    }
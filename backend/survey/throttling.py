@@ -1,11 +1,149 @@
+import math
+
+from asgiref.sync import sync_to_async
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.request import Request
 from rest_framework.throttling import SimpleRateThrottle
 
+from .metrics import registry
+
+
+def has_native_incr(alias=DEFAULT_CACHE_ALIAS):
+    """
+    Атомарный incr на стороне сервера кэша, сохраняющий срок жизни ключа.
+
+    По алиасу, а не по объекту: django.core.cache.cache (и кэш DRF) —
+    прокси, isinstance с бэкендом на нем не срабатывает.
+    """
+    return isinstance(caches[alias], (RedisCache, BaseMemcachedCache))
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    Приближенное скользящее окно: два счетчика на ключ вместо списка отметок.
+
+    Оценка числа запросов за последние duration секунд:
+    previous * (доля прошлого окна, еще попадающая в интервал) + current.
+    Память и стоимость проверки не зависят от числа запросов с ключа.
+
+    Счетчик атомарен только в Redis/Memcached (INCR, срок жизни ключа
+    сохраняется). В остальных бэкендах incr — это get + set: параллельные
+    запросы теряют инкременты, поэтому check --deploy требует Redis или
+    Memcached (survey.E005).
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        current_key = f"{self.key}_{window}"
+        previous_key = f"{self.key}_{window - 1}"
+
+        counts = self.cache.get_many([current_key, previous_key])
+        self.current = counts.get(current_key, 0)
+        self.previous = counts.get(previous_key, 0)
+        self.elapsed = self.now - window * self.duration
+
+        weight = 1 - self.elapsed / self.duration
+        if self.previous * weight + self.current + 1 > self.num_requests:
+            self.record_decision(False)
+            return False
+
+        self.increment(current_key)
+        self.record_decision(True)
+        return True
+
+    def increment(self, key):
+        # Счетчик нужен и в следующем окне — как previous
+        timeout = 2 * self.duration
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            if self.cache.add(key, 1, timeout):
+                return
+            self.cache.incr(key)
+
+        if not has_native_incr():
+            # incr через set ставит срок по умолчанию (300 с): без touch
+            # дневное окно обнулялось бы после пяти минут без запросов
+            self.cache.touch(key, timeout)
+
+    def record_decision(self, allowed):
+        decision = "allowed" if allowed else "throttled"
+        registry.inc("survey_throttle_decisions_total", (("scope", self.scope), ("decision", decision)))
+
+    def wait(self):
+        """
+        Через сколько секунд оценка опустится ниже лимита.
+        """
+        limit = self.num_requests - 1
+        if self.current > limit:
+            # В этом окне лимит исчерпан: ждем следующего, где текущие станут previous
+            remaining = self.duration - self.elapsed
+            return math.ceil(remaining + self.duration * max(0.0, 1 - limit / self.current))
+
+        needed = 1 - (limit - self.current) / self.previous
+        return max(0.0, math.ceil(self.duration * needed - self.elapsed))
+
+
+class AnonSlidingWindowRateThrottle(SlidingWindowRateThrottle):
+    """
+    Замена AnonRateThrottle: общий лимит анонимных запросов с IP.
+    """
+
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class SurveySubmitRateThrottle(SlidingWindowRateThrottle):
+    """
+    Лимит отправок на опрос с IP: клиенты за общим NAT оператора
+    не делят один лимит, а перебор одного опроса ограничен.
+    """
 
-class SurveySubmitRateThrottle(SimpleRateThrottle):
     scope = 'survey_submit'
 
     def get_cache_key(self, request, view):
         if request.method != 'POST':
             return None
-        ident = self.get_ident(request)
+
+        token = request.resolver_match.kwargs.get('token') if request.resolver_match else None
+        ident = f"{token}_{self.get_ident(request)}"
         return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+def check_throttles(request, throttle_classes, view=None):
+    """
+    Троттлинг DRF для вьюх вне APIView. Возвращает ожидание в секундах
+    (как Retry-After) или None, если запрос разрешен.
+
+    Запрос оборачивается в DRF Request без аутентификаторов — как у
+    публичных APIView, пользователь всегда анонимный.
+    """
+    request = Request(request, authenticators=())
+
+    waits = []
+    for throttle_class in throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, view):
+            waits.append(throttle.wait())
+
+    if not waits:
+        return None
+    return max((wait for wait in waits if wait is not None), default=0)
+
+
+# Только кэш, без БД: вызов не привязан к потоку, и проверки не ждут друг друга
+acheck_throttles = sync_to_async(check_throttles, thread_sensitive=False)
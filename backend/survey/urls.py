@@ -1,12 +1,33 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Имена этих маршрутов совпадают с корневыми (dashboard/...): без пространства имен
+# reverse("owner-dashboard") и {% url %} в шаблонах давали бы /api/v1/dashboard/
+app_name = 'survey'
+
+sync_public_urlpatterns = [
+    path('public/health/', views.HealthView.as_view(), name='health'),
+    path('public/surveys/<uuid:token>/', views.PublicSurveyDetailView.as_view(), name='public-survey-detail'),
+    path('public/surveys/<uuid:token>/submit/', views.PublicSurveySubmitView.as_view(), name='public-survey-submit'),
+]
+
+# Под ASGI: нативные async-вьюхи, без потока на соединение
+async_public_urlpatterns = [
+    path('public/health/', async_views.health_view, name='health'),
+    path('public/surveys/<uuid:token>/', async_views.public_survey_detail_view, name='public-survey-detail'),
+    path('public/surveys/<uuid:token>/submit/', async_views.public_survey_submit_view, name='public-survey-submit'),
+]
 
 urlpatterns = [
     path("dashboard/", views.owner_dashboard_view, name="owner-dashboard"),
     path("dashboard/survey/<int:pk>/", views.owner_survey_detail, name="owner-survey-detail"),
+    path("dashboard/surveys/", views.owner_dashboard_surveys, name="owner-dashboard-surveys"),
+    path("dashboard/export/", views.answers_export_view, name="answers-export"),
+    path("dashboard/trend/", views.rating_trend_view, name="rating-trend"),
 
     # API оставляем отдельно
-    path('public/health/', views.HealthView.as_view(), name='health'),
-    path('public/surveys/<uuid:token>/', views.PublicSurveyDetailView.as_view(), name='public-survey-detail'),
-    path('public/surveys/<uuid:token>/submit/', views.PublicSurveySubmitView.as_view(), name='public-survey-submit'),
+    *(async_public_urlpatterns if settings.ASYNC_PUBLIC_API else sync_public_urlpatterns),
+    path('public/metrics/', views.metrics_view, name='metrics'),
+    path('surveys/bulk/', views.SurveyBulkIssueView.as_view(), name='survey-bulk-issue'),
 ]
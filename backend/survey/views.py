@@ -1,14 +1,48 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.db import transaction
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateformat import format as date_format
+from django.utils.http import parse_etags
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg, Count
 from rest_framework import status
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import Question, Survey, Answer
-from .serializers import SubmitSurveySerializer, SurveyPublicSerializer
+from .analytics import get_question_stats
+from .cache import questions_cache
+from .dates import as_date, datetime_range
+from .db import pool_stats
+from .export import aiter_chunks, iter_answer_rows, iter_csv
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry
+from .models import OutboxEvent, Question, Survey, SurveySubmission
+from .outbox import enqueue
+from .ownership import is_owner, owner_point_ids
+from .pagination import InvalidCursor, keyset_page
+from .parsers import NDJSONParser
+from .routers import is_sticky, iter_replica_reads, read_from_replica
+from .serializers import (
+    BulkSurveyIssueSerializer,
+    SubmitSurveySerializer,
+    encode_questions,
+    render_survey_public,
+)
+from .stats import (
+    TREND_BUCKETS,
+    get_daily_stats,
+    get_or_set_stats,
+    point_daily_stats,
+    summarize_daily_stats,
+    trend_stats,
+)
 from .throttling import SurveySubmitRateThrottle
 
 from django.utils.dateparse import parse_date
@@ -29,7 +63,7 @@ class CustomLoginView(LoginView):
         if user.is_superuser:
             return "/admin/"
 
-        if hasattr(user, "ownerprofile"):
+        if is_owner(user):
             return "/dashboard/"
 
         return "/"
@@ -61,42 +95,104 @@ def custom_login_view(request):
 # HEALTH CHECK
 # =====================================================
 
+def health_payload():
+    payload = {"status": "ok"}
+    pools = pool_stats()
+    if pools:
+        payload["db_pool"] = pools
+    return payload
+
+
 class HealthView(APIView):
     authentication_classes = []
     permission_classes = []
 
     def get(self, request):
-        return Response({"status": "ok"})
+        return Response(health_payload())
+
+
+def metrics_view(request):
+    """
+    Метрики всех воркеров в текстовом формате Prometheus.
+
+    Эндпоинт публичный, поэтому без METRICS_TOKEN открыт только при DEBUG.
+    """
+
+    token = settings.METRICS_TOKEN
+    if not token and not settings.DEBUG:
+        return HttpResponseForbidden()
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponseForbidden()
+
+    return HttpResponse(registry.render(), content_type=METRICS_CONTENT_TYPE)
 
 
 # =====================================================
 # ВОПРОСЫ БЕЗ ДУБЛЕЙ
 # =====================================================
 
-def get_survey_questions(survey):
+def load_survey_questions(was_pickup, was_tire_service):
     qs = Question.objects.filter(is_active=True)
 
     categories = []
 
-    if survey.was_pickup:
+    if was_pickup:
         categories.append(Question.Category.PICKUP)
 
-    if survey.was_tire_service:
+    if was_tire_service:
         categories.append(Question.Category.TIRE_SERVICE)
 
     categories.append(Question.Category.COMMON)
 
-    return (
+    return tuple(
         qs.filter(category__in=categories)
         .distinct()
         .order_by("order", "id")
     )
 
 
+def get_survey_questions(survey):
+    # Активных вопросов мало и меняются они редко — держим в памяти процесса
+    key = (survey.was_pickup, survey.was_tire_service)
+    return questions_cache.get_or_set(key, lambda: load_survey_questions(*key))
+
+
+def get_survey_questions_json(survey):
+    key = ("json", survey.was_pickup, survey.was_tire_service)
+    return questions_cache.get_or_set(key, lambda: encode_questions(get_survey_questions(survey)))
+
+
 # =====================================================
 # PUBLIC SURVEY DETAIL
 # =====================================================
 
+def get_survey_etag(survey, questions_version):
+    """
+    Сильный ETag ответа PublicSurveyDetailView.
+
+    Строится из всех полей опроса и ПВЗ, попадающих в ответ, и версии
+    активных вопросов — сериализатор для этого не нужен.
+    """
+    state = (
+        survey.token.hex,
+        survey.order_number,
+        survey.completed,
+        survey.was_pickup,
+        survey.was_tire_service,
+        survey.point_id,
+        survey.point.name,
+        survey.point.city,
+        questions_version,
+    )
+    digest = hashlib.blake2b(repr(state).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request, etag):
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+    return "*" in if_none_match or etag in {tag.removeprefix("W/") for tag in if_none_match}
+
+
 class PublicSurveyDetailView(APIView):
     authentication_classes = []
     permission_classes = []
@@ -107,20 +203,64 @@ class PublicSurveyDetailView(APIView):
             token=token,
         )
 
-        questions = get_survey_questions(survey)
-
-        serializer = SurveyPublicSerializer(
-            survey,
-            context={"questions": questions},
-        )
+        # Повторные открытия ссылки: 304 без сериализации
+        etag = get_survey_etag(survey, questions_cache.version())
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            # Горячий путь: готовый JSON вопросов + конверт опроса, без DRF-полей
+            response = HttpResponse(
+                render_survey_public(survey, get_survey_questions_json(survey)),
+                content_type="application/json",
+            )
 
-        return Response(serializer.data)
+        response["ETag"] = etag
+        response["Cache-Control"] = "no-cache"
+        return response
 
 
 # =====================================================
 # PUBLIC SURVEY SUBMIT
 # =====================================================
 
+SURVEY_ALREADY_COMPLETED = "Survey already completed."
+INVALID_IDEMPOTENCY_KEY = "Invalid Idempotency-Key header."
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+
+def get_idempotency_key(request):
+    """
+    Значение заголовка Idempotency-Key: "" — заголовка нет, None — некорректный.
+    """
+    key = request.headers.get("Idempotency-Key", "").strip()
+    if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        return None
+    return key
+
+
+def get_replayed_response(survey, idempotency_key):
+    if not idempotency_key:
+        return None
+    return (
+        SurveySubmission.objects.filter(survey=survey, idempotency_key=idempotency_key)
+        .values_list("response", flat=True)
+        .first()
+    )
+
+
+def get_completed_response(survey, idempotency_key):
+    """
+    Ответ на отправку уже завершенного опроса: сохраненный ответ для того же
+    Idempotency-Key или 409. Возвращает (data, status, headers) — общий
+    для APIView и async-вьюхи.
+    """
+    replayed = get_replayed_response(survey, idempotency_key)
+    if replayed is not None:
+        return replayed, status.HTTP_200_OK, {"Idempotent-Replayed": "true"}
+
+    return {"detail": SURVEY_ALREADY_COMPLETED}, status.HTTP_409_CONFLICT, {}
+
+
 class PublicSurveySubmitView(APIView):
     authentication_classes = []
     permission_classes = []
@@ -133,11 +273,12 @@ class PublicSurveySubmitView(APIView):
             token=token,
         )
 
+        idempotency_key = get_idempotency_key(request)
+        if idempotency_key is None:
+            return Response({"detail": INVALID_IDEMPOTENCY_KEY}, status=status.HTTP_400_BAD_REQUEST)
+
         if survey.completed:
-            return Response(
-                {"detail": "Survey already completed."},
-                status=status.HTTP_409_CONFLICT,
-            )
+            return self.completed_response(survey, idempotency_key)
 
         questions = get_survey_questions(survey)
 
@@ -150,119 +291,325 @@ class PublicSurveySubmitView(APIView):
         )
 
         serializer.is_valid(raise_exception=True)
-        serializer.save()
 
-        survey.completed = True
-        survey.completed_at = timezone.now()
-        survey.save(update_fields=["completed", "completed_at"])
+        response_data = complete_survey(survey, serializer, idempotency_key)
+        if response_data is None:
+            # Параллельный запрос завершил опрос раньше
+            return self.completed_response(survey, idempotency_key)
 
-        rating_answers = (
-            survey.answers
-            .exclude(answer_rating__isnull=True)
-            .values_list("answer_rating", flat=True)
-        )
+        return Response(response_data, status=status.HTTP_200_OK)
 
-        all_ratings_good = bool(rating_answers) and all(r >= 4 for r in rating_answers)
+    def completed_response(self, survey, idempotency_key):
+        data, code, headers = get_completed_response(survey, idempotency_key)
+        return Response(data, status=code, headers=headers)
+
+
+def complete_survey(survey, serializer, idempotency_key=""):
+    """
+    Завершение опроса и запись ответов. Вызывается внутри транзакции,
+    побочные действия ставятся в outbox в ней же.
+
+    Победителя среди параллельных отправок выбирает условный UPDATE
+    (completed=False -> True): проигравший получает None и ничего не пишет.
+    Блокировка строки держится только до конца этой короткой транзакции,
+    валидация идет до нее.
+
+    Вместе с чтением опроса во вьюхе отправка — 4 запроса внутри транзакции
+    (SELECT опроса, UPDATE, INSERT события outbox, INSERT ответов) и пятый
+    с Idempotency-Key (INSERT SurveySubmission); benchmark_public_api
+    считает еще BEGIN и COMMIT.
+    """
+    completed_at = timezone.now()
+    claimed = Survey.objects.filter(pk=survey.pk, completed=False).update(
+        completed=True,
+        completed_at=completed_at,
+    )
+    if not claimed:
+        return None
+
+    survey.completed = True
+    survey.completed_at = completed_at
+
+    # Ответ собираем из провалидированных данных, без повторных запросов
+    rating_answers = [
+        item["rating"]
+        for item in serializer.validated_data["validated_answers"]
+        if item["rating"] is not None
+    ]
+
+    # Сводка и уведомления — в воркере process_outbox, не задерживая клиента.
+    # Событие ставится до записи ответов: пока оно не обработано, сигналы
+    # правок ответов не трогают сводку (см. completion_accounted)
+    enqueue(OutboxEvent.Kind.SURVEY_COMPLETED, survey_id=survey.pk, ratings=rating_answers)
+
+    serializer.save()
+
+    all_ratings_good = bool(rating_answers) and all(r >= 4 for r in rating_answers)
+
+    response_data = {
+        "show_review_page": all_ratings_good,
+        "review_links": None,
+        "average_rating": (
+            sum(rating_answers) / len(rating_answers) if rating_answers else None
+        ),
+    }
 
-        response_data = {
-            "show_review_page": all_ratings_good,
-            "review_links": None,
-            "average_rating": survey.average_rating,
+    if all_ratings_good:
+        response_data["review_links"] = {
+            "2gis": survey.point.review_link_2gis,
+            "yandex": survey.point.review_link_yandex,
         }
 
-        if all_ratings_good:
-            response_data["review_links"] = {
-                "2gis": survey.point.review_link_2gis,
-                "yandex": survey.point.review_link_yandex,
-            }
+    if idempotency_key:
+        SurveySubmission.objects.create(
+            survey=survey,
+            idempotency_key=idempotency_key,
+            response=response_data,
+        )
 
-        return Response(response_data, status=status.HTTP_200_OK)
+    return response_data
+
+
+# =====================================================
+# BULK SURVEY ISSUE
+# =====================================================
+
+class SurveyBulkIssueView(APIView):
+    """
+    Массовая выдача опросов из системы заказов.
+
+    Принимает {"orders": [...]}, голый список или NDJSON-поток.
+    Токены возвращаются в порядке входных заказов; повтор по
+    (point, order_number) возвращает уже выданный токен.
+    """
+
+    permission_classes = [IsAdminUser]
+    parser_classes = [JSONParser, NDJSONParser]
+    throttle_classes = []
+
+    def post(self, request):
+        data = request.data
+        if isinstance(data, list):
+            data = {"orders": data}
+
+        serializer = BulkSurveyIssueSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        surveys = serializer.save()
+
+        return Response({"surveys": surveys}, status=status.HTTP_200_OK)
 
 
 # =====================================================
 # OWNER DASHBOARD
 # =====================================================
 
+def get_owner_surveys(point_ids, date_from=None, date_to=None):
+    return (
+        Survey.objects.filter(
+            point_id__in=point_ids,
+            **datetime_range("created_at", date_from, date_to),
+        )
+        .select_related("point")
+        .with_average_rating()
+    )
+
+
 @login_required
+@read_from_replica
 def owner_dashboard_view(request):
 
     if request.user.is_superuser:
         return redirect("/admin/")
 
-    if not hasattr(request.user, "ownerprofile"):
+    point_ids = owner_point_ids(request.user)
+    if point_ids is None:
         return redirect("login")
 
-    points = request.user.ownerprofile.points.all()
-
-    surveys = Survey.objects.filter(point__in=points).select_related("point")
-
     date_from = request.GET.get("date_from")
     date_to = request.GET.get("date_to")
 
-    if date_from:
-        surveys = surveys.filter(created_at__date__gte=date_from)
-
-    if date_to:
-        surveys = surveys.filter(created_at__date__lte=date_to)
-
-    answers = Answer.objects.filter(
-        survey__in=surveys,
-        answer_rating__isnull=False
+    # Первая страница заказов, остальные подгружаются через owner_dashboard_surveys
+    surveys, next_cursor = keyset_page(
+        get_owner_surveys(point_ids, date_from, date_to),
+        page_size=settings.OWNER_DASHBOARD_PAGE_SIZE,
     )
 
+    # Агрегаты берем из суточной сводки, а не из Answer
+    daily_stats = get_daily_stats(point_ids, date_from, date_to)
+
     # ==========================
     # ОБЩАЯ СТАТИСТИКА
     # ==========================
 
-    total_orders = surveys.count()
-    total_feedback_orders = surveys.filter(completed=True).count()
-    total_reviews = answers.count()
-
-    avg_rating = answers.aggregate(avg=Avg("answer_rating"))["avg"]
+    totals = summarize_daily_stats(daily_stats)
 
     # ==========================
     # СТАТИСТИКА ПО КАЖДОМУ ПВЗ
     # ==========================
 
-    point_stats = (
-        answers.values(
-            "survey__point__id",
-            "survey__point__city",
-            "survey__point__name",
-        )
-        .annotate(
-            avg_rating=Avg("answer_rating"),
-            total_orders_with_rating=Count("survey", distinct=True),
-        )
-        .order_by("-avg_rating")
-    )
+    point_stats = point_daily_stats(daily_stats)
+
+    # ==========================
+    # СТАТИСТИКА ПО ВОПРОСАМ
+    # ==========================
+
+    question_stats = get_question_stats(point_ids, date_from, date_to)
 
     context = {
-        "surveys": surveys.order_by("-created_at"),
-        "total_orders": total_orders,
-        "total_feedback_orders": total_feedback_orders,
-        "total_reviews": total_reviews,
-        "avg_rating": avg_rating,
+        "surveys": surveys,
+        "next_cursor": next_cursor,
+        "total_orders": totals["issued_count"],
+        "total_feedback_orders": totals["completed_count"],
+        "total_reviews": totals["rating_count"],
+        "avg_rating": totals["avg_rating"],
         "point_stats": point_stats,
+        "question_stats": question_stats,
+        "date_from": date_from,
+        "date_to": date_to,
     }
 
     return render(request, "owner/dashboard.html", context)
 
 
+@login_required
+@read_from_replica
+def owner_dashboard_surveys(request):
+    """
+    Следующие страницы списка заказов дашборда (JSON, keyset по курсору).
+    """
+
+    point_ids = owner_point_ids(request.user)
+    if point_ids is None:
+        return JsonResponse({"detail": "Forbidden."}, status=403)
+
+    surveys = get_owner_surveys(
+        point_ids,
+        request.GET.get("date_from"),
+        request.GET.get("date_to"),
+    )
+
+    try:
+        page, next_cursor = keyset_page(
+            surveys,
+            cursor=request.GET.get("cursor"),
+            page_size=settings.OWNER_DASHBOARD_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        return JsonResponse({"detail": "Invalid cursor."}, status=400)
+
+    results = [
+        {
+            "id": survey.pk,
+            "order_number": survey.order_number,
+            "point": f"{survey.point.city} — {survey.point.name}",
+            "avg_rating": survey.avg_rating,
+            "created_at": date_format(timezone.localtime(survey.created_at), "d.m.Y H:i"),
+            "url": reverse("owner-survey-detail", args=[survey.pk]),
+        }
+        for survey in page
+    ]
+
+    return JsonResponse({"results": results, "next_cursor": next_cursor})
+
+
+# =====================================================
+# RATING TRENDS
+# =====================================================
+
+@login_required
+@read_from_replica
+def rating_trend_view(request):
+    """
+    Динамика оценок по ПВЗ для графиков (JSON, колоночный формат).
+
+    ?bucket=day|week|month&date_from=&date_to= — по умолчанию неделя
+    за последние TREND_DEFAULT_DAYS дней. Кэшируется на (набор ПВЗ, период,
+    интервал) до следующего прохождения опроса в одном из этих ПВЗ.
+    """
+
+    if request.user.is_superuser:
+        point_ids = None
+    else:
+        point_ids = owner_point_ids(request.user)
+        if point_ids is None:
+            return JsonResponse({"detail": "Forbidden."}, status=403)
+
+    bucket = request.GET.get("bucket", "week")
+    if bucket not in TREND_BUCKETS:
+        return JsonResponse({"detail": f"bucket must be one of: {', '.join(TREND_BUCKETS)}."}, status=400)
+
+    today = timezone.localdate()
+    date_from = request.GET.get("date_from") or str(today - timedelta(days=settings.TREND_DEFAULT_DAYS - 1))
+    date_to = request.GET.get("date_to") or str(today)
+    if as_date(date_from) is None or as_date(date_to) is None:
+        return JsonResponse({"detail": "Invalid date."}, status=400)
+
+    data = get_or_set_stats(
+        point_ids,
+        f"trend:{date_from}:{date_to}:{bucket}",
+        lambda: trend_stats(point_ids, date_from, date_to, bucket),
+        timeout=settings.TREND_CACHE_TIMEOUT,
+    )
+    return JsonResponse(data)
+
+
+# =====================================================
+# ANSWERS EXPORT
+# =====================================================
+
+@login_required
+@read_from_replica
+def answers_export_view(request):
+    """
+    CSV-выгрузка ответов: строка на опрос, колонка на вопрос.
+
+    Суперпользователь выгружает все ПВЗ, владелец — только свои.
+    """
+
+    if request.user.is_superuser:
+        point_ids = None
+    else:
+        point_ids = owner_point_ids(request.user)
+        if point_ids is None:
+            return HttpResponseForbidden()
+
+    date_from = request.GET.get("date_from")
+    date_to = request.GET.get("date_to")
+
+    rows = iter_answer_rows(
+        point_ids,
+        date_from,
+        date_to,
+        chunk_size=settings.EXPORT_CHUNK_SIZE,
+    )
+
+    filename = "survey_answers_{}_{}.csv".format(date_from or "start", date_to or "now")
+    # Строки читаются уже после выхода из вьюхи, при отдаче ответа
+    content = iter_replica_reads(iter_csv(rows), enabled=not is_sticky(request))
+    if isinstance(request, ASGIRequest):
+        # Синхронный итератор ASGIHandler собрал бы в память целиком
+        content = aiter_chunks(content)
+    response = StreamingHttpResponse(content, content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 # =====================================================
 # OWNER SURVEY DETAIL
 # =====================================================
 
 @login_required
+@read_from_replica
 def owner_survey_detail(request, pk):
 
-    if not hasattr(request.user, "ownerprofile"):
+    point_ids = owner_point_ids(request.user)
+    if point_ids is None:
         return render(request, "owner/no_access.html")
 
     survey = get_object_or_404(
         Survey.objects.select_related("point"),
         pk=pk,
-        point__in=request.user.ownerprofile.points.all()
+        point_id__in=point_ids
     )
 
     answers = survey.answers.select_related("question")
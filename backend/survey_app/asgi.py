@@ -2,5 +2,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'survey_app.settings')
+# Под ASGI публичное API обслуживают нативные async-вьюхи
+os.environ.setdefault('ASYNC_PUBLIC_API', 'True')
 
 application = get_asgi_application()
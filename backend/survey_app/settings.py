@@ -1,8 +1,11 @@
 from pathlib import Path
+from urllib.parse import urlparse
 import os
+import tempfile
 
 from django.urls import reverse
 import dj_database_url
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,7 +13,8 @@ load_dotenv()
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = os.getenv('DJANGO_SECRET_KEY', 'dev-secret-key')
-DEBUG = True
+# В проде DEBUG выключен: иначе каждый SQL копится в connection.queries
+DEBUG = os.getenv('DEBUG', 'False') == 'True'
 ALLOWED_HOSTS = [h.strip() for h in os.getenv('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',') if h.strip()]
 
 INSTALLED_APPS = [
@@ -33,6 +37,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'survey.middleware.RequestMetricsMiddleware',
+    'survey.middleware.DatabasePoolOverflowMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -40,6 +46,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'survey.middleware.ReplicaStickyMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'survey.middleware.BlockOwnerAdminMiddleware',
 ]
@@ -67,10 +74,96 @@ ASGI_APPLICATION = 'survey_app.asgi.application'
 DATABASES = {
     'default': dj_database_url.parse(
         os.getenv('DATABASE_URL', f'sqlite:///{BASE_DIR / "db.sqlite3"}'),
-        conn_max_age=600,
+        conn_max_age=int(os.getenv('CONN_MAX_AGE', '600')),
+        # Постоянное соединение проверяется перед переиспользованием в новом запросе
+        conn_health_checks=os.getenv('CONN_HEALTH_CHECKS', 'True') == 'True',
     )
 }
 
+# Реплика для дашбордов и выгрузки (survey.routers.ReplicaRouter); без нее всё на primary
+if os.getenv('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = dj_database_url.parse(
+        os.getenv('DATABASE_REPLICA_URL'),
+        conn_max_age=DATABASES['default']['CONN_MAX_AGE'],
+        conn_health_checks=DATABASES['default']['CONN_HEALTH_CHECKS'],
+    )
+    # В тестах реплика — та же база, что и default
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['survey.routers.ReplicaRouter']
+
+# Сколько секунд после записи сессия читает с primary
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '10'))
+
+# Пул соединений psycopg 3 (только PostgreSQL). Соединения берутся из пула на
+# запрос и возвращаются в конце, поэтому CONN_MAX_AGE при пуле не используется.
+DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+
+if DB_POOL:
+    for database in DATABASES.values():
+        if database['ENGINE'] != 'django.db.backends.postgresql':
+            continue
+        database['CONN_MAX_AGE'] = 0
+        database.setdefault('OPTIONS', {})['pool'] = {
+            # На воркер: min_size держится открытым, max_size — потолок
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            # Сколько ждать свободное соединение, прежде чем отдать 503
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '5')),
+            # Очередь ожидающих сверх max_size; дальше — отказ сразу (0 — без ограничения)
+            'max_waiting': int(os.getenv('DB_POOL_MAX_WAITING', '0')),
+            'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '600')),
+            'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '3600')),
+        }
+
+def cache_config(url=None):
+    """
+    CACHE_URL -> настройки CACHES['default'].
+
+    redis://host:6379/0, rediss://... — общий Redis для всех воркеров;
+    db://table_name — DatabaseCache (нужен manage.py createcachetable);
+    file:///path — FileBasedCache, общий для воркеров одного хоста;
+    locmem:// — память процесса (только для разработки).
+
+    Без CACHE_URL — файловый кэш: общий для воркеров хоста и не требует сети.
+    """
+    url = url or f'file://{Path(tempfile.gettempdir()) / "survey_app_cache"}'
+    parsed = urlparse(url)
+
+    if parsed.scheme in ('redis', 'rediss'):
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': url,
+        }
+    if parsed.scheme == 'db':
+        return {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': parsed.netloc or parsed.path.lstrip('/') or 'survey_cache',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    if parsed.scheme == 'file':
+        return {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': parsed.path,
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    if parsed.scheme == 'locmem':
+        return {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': parsed.netloc or 'survey',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    raise ValueError(f'Unsupported CACHE_URL scheme: {parsed.scheme!r}')
+
+
+# Троттлинг DRF и кэши опроса работают через CACHES['default'].
+CACHES = {
+    'default': {
+        **cache_config(os.getenv('CACHE_URL')),
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'survey'),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -90,13 +183,14 @@ STATICFILES_DIRS = []
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 CORS_ALLOWED_ORIGINS = [
     origin.strip() for origin in os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:5173').split(',') if origin.strip()
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
+        'survey.throttling.AnonSlidingWindowRateThrottle',
         'survey.throttling.SurveySubmitRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
@@ -105,6 +199,68 @@ REST_FRAMEWORK = {
     },
 }
 
+# Массовая выдача опросов (POST /api/v1/surveys/bulk/)
+SURVEY_BULK_MAX_ITEMS = int(os.getenv('SURVEY_BULK_MAX_ITEMS', '50000'))
+SURVEY_BULK_CHUNK_SIZE = int(os.getenv('SURVEY_BULK_CHUNK_SIZE', '1000'))
+
+# Как часто воркер сверяет версию кэша активных вопросов (секунды)
+QUESTIONS_CACHE_CHECK_INTERVAL = float(os.getenv('QUESTIONS_CACHE_CHECK_INTERVAL', '5'))
+
+# Размер страницы списка заказов на дашборде владельца
+OWNER_DASHBOARD_PAGE_SIZE = int(os.getenv('OWNER_DASHBOARD_PAGE_SIZE', '50'))
+
+# Размер пачки серверного курсора при выгрузке ответов
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
+# Права владельцев в общем кэше (версионируются; срок — чтобы старые версии не копились)
+OWNERSHIP_CACHE_TIMEOUT = int(os.getenv('OWNERSHIP_CACHE_TIMEOUT', str(6 * 3600)))
+
+# Тренды оценок (GET /dashboard/trend/)
+TREND_DEFAULT_DAYS = int(os.getenv('TREND_DEFAULT_DAYS', '90'))
+TREND_CACHE_TIMEOUT = int(os.getenv('TREND_CACHE_TIMEOUT', '300'))
+
+# Статистика по вопросам на дашбордах
+QUESTION_STATS_CACHE_TIMEOUT = int(os.getenv('QUESTION_STATS_CACHE_TIMEOUT', '300'))
+
+# Воркер outbox (manage.py process_outbox)
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '100'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '10'))
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '1'))
+OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', '7'))
+
+# Уведомления владельцам о низких оценках (дайджесты шлет process_outbox)
+ALERT_RATING_THRESHOLD = int(os.getenv('ALERT_RATING_THRESHOLD', '2'))
+ALERT_DIGEST_WINDOW = int(os.getenv('ALERT_DIGEST_WINDOW', '300'))
+ALERT_DIGEST_MAX_ITEMS = int(os.getenv('ALERT_DIGEST_MAX_ITEMS', '50'))
+ALERT_BACKENDS = [
+    backend.strip()
+    for backend in os.getenv('ALERT_BACKENDS', 'survey.alerts.EmailAlertBackend').split(',')
+    if backend.strip()
+]
+ALERT_WEBHOOK_URL = os.getenv('ALERT_WEBHOOK_URL', '')
+ALERT_WEBHOOK_TIMEOUT = float(os.getenv('ALERT_WEBHOOK_TIMEOUT', '5'))
+# Повтор недоставленного дайджеста: 30 с, 60 с, ... не реже раза в ALERT_RETRY_MAX_DELAY
+ALERT_RETRY_BASE_DELAY = int(os.getenv('ALERT_RETRY_BASE_DELAY', '30'))
+ALERT_RETRY_MAX_DELAY = int(os.getenv('ALERT_RETRY_MAX_DELAY', '3600'))
+ALERT_MAX_ATTEMPTS = int(os.getenv('ALERT_MAX_ATTEMPTS', '10'))
+
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False') == 'True'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@localhost')
+
+# Метрики запросов (GET /api/v1/public/metrics/)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', '500'))
+SLOW_REQUEST_SQL_LIMIT = int(os.getenv('SLOW_REQUEST_SQL_LIMIT', '5'))
+
+# Async-версии публичных эндпоинтов (включается в survey_app.asgi)
+ASYNC_PUBLIC_API = os.getenv('ASYNC_PUBLIC_API', 'False') == 'True'
+
 def sidebar_callback(request):
 
     if request.user.is_superuser:
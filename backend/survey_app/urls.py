@@ -1,6 +1,14 @@
 from django.contrib import admin
 from django.urls import path, include
-from survey.views import custom_login_view, custom_logout_view, owner_dashboard_view, owner_survey_detail
+from survey.views import (
+    answers_export_view,
+    custom_login_view,
+    custom_logout_view,
+    owner_dashboard_surveys,
+    owner_dashboard_view,
+    owner_survey_detail,
+    rating_trend_view,
+)
 
 urlpatterns = [
     # 🔐 Авторизация
@@ -10,6 +18,9 @@ urlpatterns = [
     # 👤 Дашборд владельца (НЕ внутри api!)
     path("dashboard/", owner_dashboard_view, name="owner-dashboard"),
     path("dashboard/survey/<int:pk>/", owner_survey_detail, name="owner-survey-detail"),
+    path("dashboard/surveys/", owner_dashboard_surveys, name="owner-dashboard-surveys"),
+    path("dashboard/export/", answers_export_view, name="answers-export"),
+    path("dashboard/trend/", rating_trend_view, name="rating-trend"),
 
     # ⚙ Админка
     path("admin/", admin.site.urls),
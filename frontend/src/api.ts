@@ -27,7 +27,16 @@ export async function fetchSurvey(token: string): Promise<SurveyData> {
   return data
 }
 
-export async function submitSurvey(token: string, answers: { question_id: number; answer: unknown }[]) {
-  const { data } = await api.post(`/public/surveys/${token}/submit/`, { answers })
+export async function submitSurvey(
+  token: string,
+  answers: { question_id: number; answer: unknown }[],
+  idempotencyKey: string,
+) {
+  // Повтор с тем же ключом (двойное нажатие, обрыв сети) вернет тот же ответ, а не 409
+  const { data } = await api.post(
+    `/public/surveys/${token}/submit/`,
+    { answers },
+    { headers: { 'Idempotency-Key': idempotencyKey } },
+  )
   return data as { show_review_page: boolean; review_links: null | { '2gis': string; yandex: string } }
 }
@@ -10,6 +10,7 @@ export function SurveyPage() {
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState('')
   const { register, handleSubmit } = useForm<Record<string, unknown>>()
+  const [idempotencyKey] = useState(() => crypto.randomUUID?.() ?? `${Date.now()}-${Math.random()}`)
 
   useEffect(() => {
     if (!token) return
@@ -42,7 +43,7 @@ export function SurveyPage() {
       .filter(Boolean) as { question_id: number; answer: unknown }[]
 
     try {
-      const result = await submitSurvey(token, answers)
+      const result = await submitSurvey(token, answers, idempotencyKey)
       if (result.show_review_page) {
         if (result.review_links) {
           sessionStorage.setItem('review_links', JSON.stringify(result.review_links))